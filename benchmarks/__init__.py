@@ -0,0 +1,4 @@
+"""Performance benchmarks of pyJsJson.
+
+Run `python -m benchmarks --help` (from the project root) for the usage.
+"""
@@ -0,0 +1,72 @@
+"""Benchmark CLI.
+
+    python -m benchmarks run --output results.json
+    python -m benchmarks compare baseline.json results.json
+"""
+
+import argparse
+import json
+import sys
+
+from . import corpora, runner
+
+
+def get_arg_parser():
+    parser = argparse.ArgumentParser(prog='benchmarks', description='pyJsJson performance benchmarks')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    run = subparsers.add_parser('run', help='Run the benchmarks')
+    run.add_argument(
+        '--corpus', dest='corpora', action='append', choices=sorted(corpora.CORPORA),
+        help='Corpus to run (can be repeated, default: all)'
+    )
+    run.add_argument('--scale', type=int, default=1, help='Size multiplier of the generated corpora')
+    run.add_argument('--repeat', type=int, default=3, help='Number of runs (the median is reported)')
+    run.add_argument('--no-cli', dest='cli', default=True, action='store_false', help='Skip the CLI measurements')
+    run.add_argument('--output', default='-', help='Output JSON file ("-" for stdout)')
+
+    cmp = subparsers.add_parser('compare', help='Compare two benchmark result files')
+    cmp.add_argument('baseline')
+    cmp.add_argument('new')
+    cmp.add_argument(
+        '--threshold', type=float, default=0.1,
+        help='Fraction by which a metric may get worse before it is reported as a regression'
+    )
+    return parser
+
+
+def _log(msg):
+    print(msg, file=sys.stderr)
+
+
+def main(args):
+    args = get_arg_parser().parse_args(args)
+    if args.command == 'run':
+        results = runner.runAll(
+            args.corpora or sorted(corpora.CORPORA),
+            scale=args.scale, repeat=args.repeat, cli=args.cli, log=_log,
+        )
+        if args.output == '-':
+            json.dump(results, sys.stdout, indent=4, sort_keys=True)
+        else:
+            with open(args.output, 'w') as fout:
+                json.dump(results, fout, indent=4, sort_keys=True)
+        missed = runner.checkTargets(results)
+        for (name, metric, value, target) in missed:
+            _log(f"{name}: {metric} {value:.1f} is above the target of {target}")
+        return not missed
+    elif args.command == 'compare':
+        with open(args.baseline) as fin:
+            baseline = json.load(fin)
+        with open(args.new) as fin:
+            new = json.load(fin)
+        (lines, regressions) = runner.compare(baseline, new, args.threshold)
+        print('\n'.join(lines))
+        return not regressions
+    raise NotImplementedError(args.command)
+
+
+if __name__ == '__main__':
+    if not main(sys.argv[1:]):
+        sys.exit(1)
@@ -0,0 +1,104 @@
+"""Synthetic input corpora for the benchmarks.
+
+Every corpus is a function that writes its files into the `root_dir` and returns the path of
+    the root document to expand. The `scale` scales sizes of the generated documents.
+"""
+
+import json
+import os
+
+CORPORA = {}
+
+
+def corpus(fn):
+    CORPORA[fn.__name__] = fn
+    return fn
+
+
+def _write(root_dir, fname, data):
+    path = os.path.join(root_dir, fname)
+    with open(path, 'w') as fout:
+        json.dump(data, fout)
+    return path
+
+
+def _record(idx):
+    return {
+        'id': idx,
+        'name': f"record-{idx}",
+        'enabled': bool(idx % 2),
+        'ratio': idx / 7,
+        'tags': ['a', 'b', None],
+    }
+
+
+@corpus
+def wide(root_dir, scale):
+    """A single flat document with a lot of keys and a handful of refs."""
+    n_keys = 20000 * scale
+    _write(root_dir, 'target.json', {'value': 'hello'})
+    data = dict(
+        (f"key-{idx}", f"value-{idx}")
+        for idx in range(n_keys)
+    )
+    for idx in range(10):
+        data[f"ref-{idx}"] = {'$ref': 'file:target.json#value'}
+    return _write(root_dir, 'root.json', data)
+
+
+@corpus
+def deep(root_dir, scale):
+    """Deeply nested document with a ref at the bottom."""
+    depth = 3000
+    _write(root_dir, 'target.json', {'value': 'hello'})
+    # Rendered level by level (`json.dump` is recursive, so it could not write the document)
+    level = '{"siblings": %s, "child": ' % json.dumps([_record(el) for el in range(scale)])
+    path = os.path.join(root_dir, 'root.json')
+    with open(path, 'w') as fout:
+        fout.write(level * depth)
+        json.dump({'ref': {'$ref': 'file:target.json#value'}}, fout)
+        fout.write('}' * depth)
+    return path
+
+
+@corpus
+def ref_chain(root_dir, scale):
+    """A long chain of files, each referencing the next one."""
+    length = 50 * scale
+    _write(root_dir, f'chain-{length}.json', {'end': True})
+    for idx in range(length):
+        _write(root_dir, f'chain-{idx}.json', {
+            'idx': idx,
+            'next': {'$ref': f'file:chain-{idx + 1}.json'},
+        })
+    return _write(root_dir, 'root.json', {'$ref': 'file:chain-0.json'})
+
+
+@corpus
+def diamond(root_dir, scale):
+    """A lot of refs (via a number of intermediate files) pointing at a single shared file."""
+    fan_out = 20 * scale
+    _write(root_dir, 'shared.json', {
+        'records': [_record(idx) for idx in range(100)],
+    })
+    for idx in range(fan_out):
+        _write(root_dir, f'middle-{idx}.json', {
+            'idx': idx,
+            'shared': {'$ref': 'file:shared.json'},
+            'records': {'$ref': 'file:shared.json#records'},
+        })
+    return _write(root_dir, 'root.json', dict(
+        (f'middle-{idx}', {'$ref': f'file:middle-{idx}.json'})
+        for idx in range(fan_out)
+    ))
+
+
+@corpus
+def large_array(root_dir, scale):
+    """A large array of records."""
+    length = 20000 * scale
+    _write(root_dir, 'target.json', {'value': 'hello'})
+    return _write(root_dir, 'root.json', {
+        'records': [_record(idx) for idx in range(length)],
+        'ref': {'$ref': 'file:target.json#value'},
+    })
@@ -0,0 +1,281 @@
+"""Benchmark measurements."""
+
+import gc
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pyJsJson
+
+from . import corpora
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# Memory targets of the constructed dependency graphs (excluding the decoded JSON they are built from)
+#   per graph node and per value of the JSON documents. Checked by `python -m benchmarks run` for every corpus.
+# The command-free subtrees are single (literal) nodes, so the graphs mostly consist of the container
+#   and the command nodes that are bigger than an average node used to be (when every value was a node).
+BYTES_PER_NODE_TARGET = 128
+BYTES_PER_NODE_TARGETS = {
+    'deep': 256,  # Every level is a two-key mapping node (a node, its dict and a name) and a literal
+    'diamond': 224,  # Mostly mappings of $ref commands
+    'large_array': 448,  # Just a handful of nodes, the memory is the fixed cost of the two graphs
+    'ref_chain': 192,  # Tiny files that are mostly $ref commands (a command node owns a dict)
+}
+BYTES_PER_VALUE_TARGET = 128
+BYTES_PER_VALUE_TARGETS = {
+    'ref_chain': 192,  # Same as above (every value is a node)
+}
+
+
+class _NullWriter:
+    """Text file-like object that discards everything written to it."""
+
+    def write(self, data):
+        return len(data)
+
+
+def _newExpander(root_dir):
+    expander = pyJsJson.expand.JsonExpand(allowed_search_roots=[root_dir])
+    expander.loadCommands(pyJsJson.commands.DEFAULT_COMMANDS)
+    return expander
+
+
+def runPhases(root_fname):
+    """Run the full expansion pipeline once, returning (phase -> seconds, `ExpansionStats`)."""
+    gc.collect()  # Do not pay for the garbage of the previous runs
+    expander = _newExpander(os.path.dirname(root_fname))
+    stats = pyJsJson.stats.ExpansionStats()
+    tree = expander.loadJsonFile(root_fname, stats=stats)
+    graph = expander.expandGraph(tree, stats=stats)
+    with stats.timePhase('serialize'):
+        pyJsJson.output.writeJson(graph, _NullWriter(), indent=4, sort_keys=True)
+    timings = dict(stats.phaseTimes)
+    timings['total'] = sum(timings.values())
+    return (timings, stats)
+
+
+def measurePeakMemory(root_fname):
+    """Return peak memory (bytes, as seen by tracemalloc) of a full expansion pipeline run."""
+    tracemalloc.start()
+    try:
+        runPhases(root_fname)
+        (_, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def countNodes(graph):
+    """Return number of the nodes of the dependency `graph`."""
+    out = 0
+    stack = [graph]
+    while stack:
+        node = stack.pop()
+        out += 1
+        data = node.data
+        if isinstance(node, pyJsJson.dependency_graph.base.Mapping):
+            stack.extend(data.values())
+        elif isinstance(node, pyJsJson.dependency_graph.base.Tuple):
+            stack.extend(data)
+    return out
+
+
+def countValues(data):
+    """Return number of the JSON values (containers and primitives) of the decoded `data`."""
+    out = 0
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        out += 1
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return out
+
+
+def measureGraphMemory(root_fname):
+    """Return (bytes per graph node, bytes per JSON value) of the dependency graphs of all corpus files.
+
+    The memory is as seen by tracemalloc, excluding the decoded JSON the graphs are constructed from.
+    The graphs keep the command-free subtrees as single (literal) nodes, so the per-value figure shows
+        the memory relative to the size of the input.
+    """
+    root_dir = os.path.dirname(root_fname)
+    expander = _newExpander(root_dir)
+    data = [
+        expander.fileSource.loadJsonFile(fname)
+        for fname in sorted(os.listdir(root_dir))
+        if fname.endswith('.json')
+    ]
+
+    def _construct():
+        return [
+            pyJsJson.dependency_graph.construct(
+                el, name='root', extra_constructors=expander.commandIndex,
+            )
+            for el in data
+        ]
+
+    _construct()  # Warm up the interpreter caches (e.g. of the `isinstance` checks), these are not graph memory
+    gc.collect()
+    tracemalloc.start()
+    try:
+        graphs = _construct()
+        (used, _) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (
+        used / sum(countNodes(graph) for graph in graphs),
+        used / sum(countValues(el) for el in data),
+    )
+
+
+def measureDecoders(root_fname, repeat):
+    """Return decoder name -> seconds (median) to load all corpus files, for every available decoder.
+
+    The files are loaded by a `FileSource` (so the documents nested too deep for the decoder are read as events).
+    """
+    root_dir = os.path.dirname(root_fname)
+    paths = [
+        os.path.join(root_dir, fname)
+        for fname in sorted(os.listdir(root_dir))
+        if fname.endswith('.json')
+    ]
+    out = {}
+    for decoder_cls in pyJsJson.decoders.DECODERS:
+        if not decoder_cls.isAvailable():
+            continue
+        timings = []
+        for _ in range(repeat):
+            source = pyJsJson.dataSource.FileSource(
+                (root_dir, ), follow_symlinks=True, prefetch_workers=0, decoder=decoder_cls(),
+            )
+            gc.collect()
+            start = time.perf_counter()
+            for path in paths:
+                source.loadJsonFile(path)
+            timings.append(time.perf_counter() - start)
+        out[decoder_cls.name] = statistics.median(timings)
+    return out
+
+
+def measureCli(root_fname):
+    """Return wall time of the CLI expansion of the `root_fname`."""
+    env = os.environ.copy()
+    env['PYTHONPATH'] = PROJECT_ROOT
+    start = time.perf_counter()
+    subprocess.check_call(
+        (sys.executable, '-m', 'pyJsJson', root_fname, '--output', os.devnull),
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def runCorpus(name, scale, repeat, cli=True):
+    """Run all measurements of a single corpus."""
+    with tempfile.TemporaryDirectory(prefix=f"pyJsJson-bench-{name}-") as root_dir:
+        root_fname = corpora.CORPORA[name](root_dir, scale)
+        runs = [runPhases(root_fname) for _ in range(repeat)]
+        (bytes_per_node, bytes_per_value) = measureGraphMemory(root_fname)
+        phases = dict(
+            (phase, statistics.median(timings[phase] for (timings, _) in runs))
+            for phase in runs[0][0].keys()
+        )
+        out = {
+            'wall_time': phases.pop('total'),
+            'phases': phases,
+            'loop_passes': runs[0][1].loopPasses,
+            'nodes_visited': runs[0][1].nodesVisited,
+            'tracemalloc_peak_bytes': measurePeakMemory(root_fname),
+            'bytes_per_node': bytes_per_node,
+            'bytes_per_value': bytes_per_value,
+            'decode_times': measureDecoders(root_fname, repeat),
+        }
+        if cli:
+            out['cli_wall_time'] = statistics.median(measureCli(root_fname) for _ in range(repeat))
+    return out
+
+
+def runAll(names, scale, repeat, cli=True, log=None):
+    results = {}
+    for name in names:
+        if log:
+            log(f"Running {name!r}...")
+        results[name] = runCorpus(name, scale=scale, repeat=repeat, cli=cli)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+            'scale': scale,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def checkTargets(results):
+    """Return list of (corpus name, metric, value, target) of the `runAll` results that miss their target."""
+    out = []
+    for (name, result) in sorted(results['results'].items()):
+        for (metric, default, targets) in (
+            ('bytes_per_node', BYTES_PER_NODE_TARGET, BYTES_PER_NODE_TARGETS),
+            ('bytes_per_value', BYTES_PER_VALUE_TARGET, BYTES_PER_VALUE_TARGETS),
+        ):
+            target = targets.get(name, default)
+            if result[metric] > target:
+                out.append((name, metric, result[metric], target))
+    return out
+
+
+def compare(old, new, threshold):
+    """Compare two `runAll` results.
+
+    Returns (report lines, list of regressions) where a regression is a metric that became
+        more than `threshold` (fraction) worse.
+    """
+    lines = []
+    regressions = []
+
+    def _metrics(result):
+        yield ('wall_time', result['wall_time'])
+        for (phase, value) in result['phases'].items():
+            yield (f"phase.{phase}", value)
+        yield ('loop_passes', result['loop_passes'])
+        yield ('nodes_visited', result['nodes_visited'])
+        yield ('tracemalloc_peak_bytes', result['tracemalloc_peak_bytes'])
+        if 'bytes_per_node' in result:
+            yield ('bytes_per_node', result['bytes_per_node'])
+        if 'bytes_per_value' in result:
+            yield ('bytes_per_value', result['bytes_per_value'])
+        for (decoder, value) in result.get('decode_times', {}).items():
+            yield (f"decode.{decoder}", value)
+        if 'cli_wall_time' in result:
+            yield ('cli_wall_time', result['cli_wall_time'])
+
+    for (name, new_result) in sorted(new['results'].items()):
+        old_result = old['results'].get(name)
+        if old_result is None:
+            lines.append(f"{name}: no baseline")
+            continue
+        old_metrics = dict(_metrics(old_result))
+        for (metric, new_value) in _metrics(new_result):
+            old_value = old_metrics.get(metric)
+            if not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            flag = ''
+            if change > threshold:
+                flag = '  <-- REGRESSION'
+                regressions.append((name, metric, old_value, new_value))
+            lines.append(f"{name:>12} {metric:<24} {old_value:>14.6g} -> {new_value:>14.6g} ({change:+.1%}){flag}")
+    return (lines, regressions)
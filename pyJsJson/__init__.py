@@ -3,12 +3,17 @@ from . import (
     exceptions,
     dependency_graph,
     trees,
+    stats,
 )
 
 from . import (
     commands,
     dataSource,
+    decoders,
     expand,
+    output,
+    result_cache,
+    watch,
 )
 
 from . import main
\ No newline at end of file
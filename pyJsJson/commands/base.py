@@ -14,24 +14,36 @@ from ..dependency_graph.base import (
 class Base(dependency_graph.base.Mapping):
     """Base class for commands."""
 
+    __slots__ = ('_commandRv', )
+
     key = '$UNKNOWN'
 
+    def __init__(self, name, data):
+        super(Base, self).__init__(name, data)
+        self._commandRv = None  # Memoized successful result of the action
+
     @classmethod
     def match(cls, obj):
         if not super(Base, cls).match(obj):
             # obj must be a mapping
             return False
-        keys = frozenset(obj.keys())
-        if len(keys) == 1 and keys == {cls.key}:
-            # Must have a single key and the key must match self.key
-            return True
-        return False
+        # Must have a single key and the key must match self.key
+        return len(obj) == 1 and cls.key in obj
+
+    def iterStaticReferences(self):
+        """Yield paths of the files this command will (most likely) load, relative to its tree.
+
+        Used to prefetch the files while the expansion is still running.
+        """
+        return ()
 
     def _applyMyAction(self, namespace, data):
         # Please note that this has to return 'ExpansionRv' result
         raise NotImplementedError(f"{self.__class__} ==> {data!r}")
 
     def doExpand(self, namespace):
+        if self._commandRv is not None:
+            return self._commandRv
         expanded_children_rv = super(Base, self).doExpand(namespace)
         if expanded_children_rv.state == ExpansionRvCode.SUCCESS:
             old_data = expanded_children_rv.result.data
@@ -39,6 +51,8 @@ class Base(dependency_graph.base.Mapping):
             out = self._applyMyAction(
                 namespace, old_data[self.key].getPlainObject()
             )
+            if out.state == ExpansionRvCode.SUCCESS:
+                self._commandRv = out
         else:
             out = expanded_children_rv
         return out
\ No newline at end of file
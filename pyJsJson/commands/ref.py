@@ -1,5 +1,4 @@
 import os
-import posixpath as pp
 
 from ..util import (
     URI, posix_path_to_os_path,
@@ -21,6 +20,8 @@ from . import (
 class RefSchemaExpander(BaseDependencyObject):
     """Base class for $ref schema expanders."""
 
+    __slots__ = ()
+
     scheme = 'unknown'
 
     @classmethod
@@ -36,15 +37,23 @@ class RefSchemaExpander(BaseDependencyObject):
 class FileSchemaExpander(RefSchemaExpander):
     """Expands local file."""
 
+    __slots__ = ()
+
     scheme = 'file'
 
     def doExpand(self, namespace):
         tree = namespace.loadJsonFile(posix_path_to_os_path(self.data.path))
         trees_api = namespace.root.trees
         token = trees_api.add(self, tree)
+        trees_api.addDependency(namespace.var.tree_key, token)
         if trees_api.isExpanded(token):
-            out = trees_api.getResult(token)
+            try:
+                node = trees_api.resolvePointer(token, self.data.anchor)
+            except (KeyError, IndexError) as el:
+                raise exceptions.InvalidReference(self.data, el)
+            out = ExpansionRv(ExpansionRvCode.SUCCESS, node)
         else:
+            trees_api.waitFor(namespace.var.tree_key, token)
             out = ExpansionRv(
                 ExpansionRvCode.BLOCKED_BY,
                 DependencyPrimitive(self.name, token)
@@ -55,14 +64,22 @@ class FileSchemaExpander(RefSchemaExpander):
 class Ref(base.Base):
     """$ref expander."""
 
+    __slots__ = ()
+
     key = '$ref'
 
-    def _walkAnchor(self, data, path):
-        path = tuple(el for el in path if el)
-        out = data
-        for el in path:
-            out = out.data[el]
-        return out
+    def iterStaticReferences(self):
+        target = self.data[self.key]
+        if not (isinstance(target, DependencyPrimitive) and isinstance(target.data, str)):
+            # Computed reference
+            return
+        try:
+            uri = URI.fromString(target.data)
+        except ValueError:
+            # Reported on the expansion
+            return
+        if FileSchemaExpander.match(uri) and uri.path:
+            yield posix_path_to_os_path(uri.path)
 
     def _applyMyAction(self, namespace, data):
         assert isinstance(data, str), data
@@ -73,20 +90,7 @@ class Ref(base.Base):
             data=uri
         )
         with namespace.child(name='expander') as expander_ns:
-            full_out = expander.doExpand(expander_ns)
-
-        if full_out.state == ExpansionRvCode.SUCCESS:
-            anchor_path = pp.split(uri.anchor or '')
-            try:
-                out = ExpansionRv(
-                    ExpansionRvCode.SUCCESS,
-                    self._walkAnchor(full_out.result, anchor_path)
-                )
-            except (KeyError, IndexError) as el:
-                raise exceptions.InvalidReference(uri, el)
-        else:
-            out = full_out
-        return out
+            return expander.doExpand(expander_ns)
 
     def _getExpander(self, uri):
         expanders = (
@@ -1,49 +1,283 @@
 """A class that provides input data for the expansion process (e.g. reads files)."""
 
+import codecs
+import collections
+import concurrent.futures
+import json
 import os
 import logging
-import copy
-import json
+import mmap
+import re
+import threading
 
-from . import exceptions
+from . import decoders, exceptions
+from .util import frozen
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024  # bytes of the source JSON files
+DEFAULT_PREFETCH_WORKERS = 4
+DEFAULT_MMAP_THRESHOLD = 1024 * 1024  # Files of this size (bytes) and bigger are memory-mapped
+DEFAULT_STREAM_THRESHOLD = None  # Files of this size (bytes) and bigger are read as event streams (None: never)
+DEFAULT_CHUNK_SIZE = 64 * 1024  # bytes read at once by the event reader
+
 
 class FileSource:
+    """Source of the parsed JSON files.
+
+    Files can be `prefetch()`-ed: these are read and parsed by a thread pool in the background,
+        `loadJsonFile()` then only waits for the result (and accounts it as if it had parsed the file itself).
+        The prefetches that are not used within the generation are dropped (see `newGeneration`) and the
+        pool is shut down by `close()`.
+
+    Files are read as bytes (big ones are memory-mapped) and decoded by the `decoder` backend
+        (see `decoders.getDecoder`, the fastest available one is used by default).
 
-    def __init__(self, allowed_search_dirs:tuple, follow_symlinks):
-        self._cache = {}
-        self._decoder = json.JSONDecoder()
+    If the `stream_threshold` is set, files of that size and bigger should be read with `iterJsonEvents()`
+        instead (see `isStreamed`): these are never decoded as a whole (nor cached, nor prefetched).
+        This is off by default, the (slower) event reader is only a fallback for the files that are nested
+        too deep for the decoder or that do not fit into the memory once decoded (see `JsonExpand`).
+    """
+
+    def __init__(
+        self, allowed_search_dirs: tuple, follow_symlinks,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        prefetch_workers: int = DEFAULT_PREFETCH_WORKERS,
+        decoder: decoders.Decoder = None,
+        mmap_threshold: int = DEFAULT_MMAP_THRESHOLD,
+        stream_threshold: int = DEFAULT_STREAM_THRESHOLD,
+    ):
+        self.cache = ParseCache(max_bytes=cache_size)
+        self.bytesParsed = 0
+        self.prefetchWorkers = prefetch_workers  # 0 disables the prefetching
+        self._prefetchPool = None  # Created on the first `prefetch()`
+        self._prefetched = {}  # path -> Future of (stat key, byte size, payload) or None if up to date in the cache
+        self.decoder = decoder if decoder is not None else decoders.getDecoder()
+        self.mmapThreshold = mmap_threshold
+        self.streamThreshold = stream_threshold
         self._dirs = DirChecker(allowed_search_dirs, follow_symlinks=follow_symlinks)
 
     def loadJsonFile(self, path):
-        key = os.path.normpath(path)
+        """Return parsed contents of the file `path`.
+
+        The returned object is read-only (see `util.frozen`) and is shared between all callers.
+        """
+        prefetched = self._prefetched.pop(path, None)
+        allowed_path = self.resolvePath(path)
+        fstat = os.stat(allowed_path)
+        stat_key = (fstat.st_mtime_ns, fstat.st_size, fstat.st_ino)
         try:
-            out = self._cache[key]
+            out = self.cache.get(allowed_path, stat_key)
         except KeyError:
-            # not cached
+            # not cached (or the file had changed)
             pass
         else:
             # no exception
-            return copy.deepcopy(out)
+            return out
 
-        allowed_path = self._dirs.findFile(path)
-        try:
-            with open(allowed_path, 'r') as fin:
-                out = self._decoder.decode(fin.read())
-        except:
-            logging.exception(f"Error loading JSON from file {allowed_path!r}")
-            raise
+        if prefetched is not None:
+            try:
+                prefetched = prefetched.result()
+            except Exception:
+                # The error is reported by the synchronous load below
+                prefetched = None
+        if prefetched is not None and prefetched[0] == stat_key:
+            (_, size, out) = prefetched
+        else:
+            try:
+                out = self._parse(allowed_path, fstat.st_size)
+            except:
+                logging.exception(f"Error loading JSON from file {allowed_path!r}")
+                raise
+            size = fstat.st_size
         logger.debug(f'{path!r} loaded')
-        self._cache = out
-        return copy.deepcopy(out)
+        self.bytesParsed += size
+        self.cache.put(allowed_path, stat_key, size, out)
+        return out
+
+    def prefetch(self, paths):
+        """Start loading the files `paths` in the background."""
+        if self.prefetchWorkers <= 0:
+            return
+        if self._prefetchPool is None:
+            self._prefetchPool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.prefetchWorkers,
+                thread_name_prefix='pyJsJson-prefetch',
+            )
+        for path in paths:
+            if path not in self._prefetched:
+                self._prefetched[path] = self._prefetchPool.submit(self._prefetchOne, path)
+
+    def _prefetchOne(self, path):
+        try:
+            allowed_path = self.resolvePath(path)
+            fstat = os.stat(allowed_path)
+        except (exceptions.FsError, OSError):
+            # Not loadable. Let `loadJsonFile` report that (if the file is ever requested)
+            return None
+        stat_key = (fstat.st_mtime_ns, fstat.st_size, fstat.st_ino)
+        if self._isStreamedSize(fstat.st_size) or self.cache.isValid(allowed_path, stat_key):
+            return None
+        return (stat_key, fstat.st_size, self._parse(allowed_path, fstat.st_size))
+
+    def _parse(self, allowed_path, size):
+        with open(allowed_path, 'rb') as fin:
+            try:
+                if size >= self.mmapThreshold:
+                    with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        return self.decoder.decode(data)
+                return self.decoder.decode(fin.read())
+            except RecursionError:
+                # The decoders are recursive, the event reader is not
+                logger.debug(f"{allowed_path!r} is nested too deep for {self.decoder!r}, reading it as events")
+                fin.seek(0)
+                return decodeJsonEvents(iterJsonEvents(fin))
+
+    def isStreamed(self, path):
+        """Return True if the file `path` is big enough to be read with `iterJsonEvents` (see `streamThreshold`)."""
+        if self.streamThreshold is None:
+            return False  # No need to stat the file
+        return self._isStreamedSize(os.stat(self.resolvePath(path)).st_size)
+
+    def _isStreamedSize(self, size):
+        return self.streamThreshold is not None and size >= self.streamThreshold
+
+    def iterJsonEvents(self, path):
+        """Yield JSON events (see `iterJsonEvents`) of the file `path` while it is being read."""
+        allowed_path = self.resolvePath(path)
+        with open(allowed_path, 'rb') as fin:
+            yield from iterJsonEvents(fin)
+            self.bytesParsed += fin.tell()
+        logger.debug(f'{path!r} streamed')
+
+    @property
+    def searchRoots(self):
+        """Directories the files are allowed to be loaded from."""
+        return self._dirs.roots
+
+    @property
+    def followSymlinks(self):
+        return self._dirs.follow_symlinks
+
+    def newGeneration(self):
+        """Let the cached path resolutions be re-validated against the file system (see `DirChecker`).
+
+        The unused prefetches of the previous generation are dropped (the pending ones are cancelled).
+        """
+        self._dirs.newGeneration()
+        self._dropPrefetched()
+
+    def close(self):
+        """Shut down the prefetching thread pool (waits for the running loads).
+
+        The source stays usable, a new pool is created by the next `prefetch()`.
+        """
+        self._dropPrefetched()
+        if self._prefetchPool is not None:
+            self._prefetchPool.shutdown(wait=True)
+            self._prefetchPool = None
+
+    def _dropPrefetched(self):
+        for future in self._prefetched.values():
+            future.cancel()
+        self._prefetched.clear()
+
+    def resolvePath(self, path):
+        """Return normalized path of the allowed file the `path` points to."""
+        return os.path.normpath(self._dirs.findFile(path))
+
+    def candidatePaths(self, path):
+        """Return paths (one per search root) the file `path` is looked for at, in the order of the search."""
+        return self._dirs.candidatePaths(path)
+
+    def __repr__(self):
+        return "<{} {}>".format(self.__class__.__name__, self._dirs.roots)
+
+
+class ParseCache:
+    """LRU cache of parsed JSON files.
+
+    Entries are keyed by the file path and are only valid for the same (st_mtime_ns, st_size, st_ino)
+    of the file. The size of the cache is bound by the total byte size of the cached source files.
+    The cache is thread-safe.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.maxBytes = max_bytes
+        self.totalBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = collections.OrderedDict()  # path -> (stat_key, byte size, payload)
+        self._lock = threading.Lock()
+
+    def get(self, path, stat_key):
+        """Return cached payload for the `path`. Raises KeyError if there is no valid cached entry."""
+        with self._lock:
+            try:
+                (cached_key, size, payload) = self._data[path]
+            except KeyError:
+                self.misses += 1
+                raise
+            if cached_key != stat_key:
+                # The file had changed
+                self._drop(path)
+                self.misses += 1
+                raise KeyError(path)
+            self._data.move_to_end(path)
+            self.hits += 1
+            return payload
+
+    def isValid(self, path, stat_key):
+        """Return True if there is a valid cached entry for the `path` (the hit/miss counters are not changed)."""
+        with self._lock:
+            entry = self._data.get(path)
+            return entry is not None and entry[0] == stat_key
+
+    def put(self, path, stat_key, size, payload):
+        with self._lock:
+            if path in self._data:
+                self._drop(path)
+            if size > self.maxBytes:
+                logger.debug(f"{path!r} ({size} bytes) is too big to be cached")
+                return
+            self._data[path] = (stat_key, size, payload)
+            self.totalBytes += size
+            while self.totalBytes > self.maxBytes:
+                (old_path, _) = next(iter(self._data.items()))
+                self._drop(old_path)
+                self.evictions += 1
+
+    def _drop(self, path):
+        (_, size, _) = self._data.pop(path)
+        self.totalBytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.totalBytes = 0
+
+    def __len__(self):
+        return len(self._data)
 
     def __repr__(self):
-        return "<{} {}>".format(self.__class__.__name__, self.search_paths)
+        return (
+            f"<{self.__class__.__name__} {len(self)} entries, {self.totalBytes}/{self.maxBytes} bytes"
+            f" hits={self.hits} misses={self.misses} evictions={self.evictions}>"
+        )
 
 
 class DirChecker:
+    """Resolves the requested paths to the files within the allowed roots.
+
+    Resolutions (including the failed ones) are cached. A cached resolution stays valid as long as
+        the modification times of the directories it looked into do not change. These are checked
+        at most once per generation (see `newGeneration`), so the repeated lookups cost no syscalls.
+    The caches are shared with the prefetching threads (see `FileSource.prefetch`), these are guarded by a lock.
+
+    Symlinks are only accepted if `follow_symlinks` is set. Otherwise a file is only accepted if its
+        real path is the file path within the (real path of the) root.
+    """
 
     def __init__(self, allowed_roots, follow_symlinks:bool):
         self.roots = tuple(
@@ -53,18 +287,256 @@ class DirChecker:
         self.follow_symlinks = bool(follow_symlinks)
         if __debug__:
             assert all(os.path.isdir(pth) for pth in self.roots), self.roots
+        self._realRoots = tuple(os.path.realpath(pth) for pth in self.roots)
+        self._resolved = {}  # path -> (resolved path or None if not found, root, ((dir, dir mtime), ...))
+        self._dirMtimes = {}  # dir -> mtime (ns) as seen in this generation
+        self._lock = threading.Lock()
+
+    def newGeneration(self):
+        """Start a new generation: cached resolutions are re-validated on their next use."""
+        with self._lock:
+            self._dirMtimes = {}
+
+    def _dirMtime(self, dirname):
+        # Called with the lock held
+        try:
+            return self._dirMtimes[dirname]
+        except KeyError:
+            pass
+        try:
+            out = os.stat(dirname).st_mtime_ns
+        except OSError:
+            out = None
+        self._dirMtimes[dirname] = out
+        return out
 
     def findFile(self, path):
         """Find 'path' in any of the allowed roots.
 
         The "path" can be either absolure or relative path.
         """
-        for tryRoot in self.roots:
-            maybeFile = os.path.join(tryRoot, path)
-            if maybeFile.startswith(tryRoot + os.sep) and os.path.isfile(maybeFile):
-                return maybeFile
-        else:
+        with self._lock:
+            cached = self._resolved.get(path)
+            if cached is not None and all(self._dirMtime(dirname) == mtime for (dirname, mtime) in cached[2]):
+                out = cached[0]
+            else:
+                (out, root, checked_dirs) = self._findFile(path)
+                self._resolved[path] = (out, root, tuple(
+                    (dirname, self._dirMtime(dirname))
+                    for dirname in checked_dirs
+                ))
+        if out is None:
             raise exceptions.FsError(f"File not found: {path!r} (checked in {self.roots}, follow sym links is {self.follow_symlinks})")
+        return out
+
+    def candidatePaths(self, path):
+        """Return paths (one per root the `path` can be within) the file `path` is looked for at."""
+        return tuple(maybeFile for (_, _, maybeFile) in self._iterCandidates(path))
+
+    def _iterCandidates(self, path):
+        for (tryRoot, realRoot) in zip(self.roots, self._realRoots):
+            maybeFile = os.path.normpath(os.path.join(tryRoot, path))
+            if maybeFile.startswith(tryRoot + os.sep):
+                yield (tryRoot, realRoot, maybeFile)
+
+    def _findFile(self, path):
+        """Return (resolved path or None, root, directories looked into)."""
+        checked_dirs = []
+        for (tryRoot, realRoot, maybeFile) in self._iterCandidates(path):
+            checked_dirs.append(os.path.dirname(maybeFile))
+            if not os.path.isfile(maybeFile):
+                continue
+            if not self.follow_symlinks:
+                expected = os.path.join(realRoot, os.path.relpath(maybeFile, tryRoot))
+                if os.path.realpath(maybeFile) != expected:
+                    logger.debug(f"{maybeFile!r} is (or is within) a symlink, ignored")
+                    continue
+            return (maybeFile, tryRoot, checked_dirs)
+        return (None, None, checked_dirs)
 
     def __repr__(self):
-        return "<{} {}>".format(self.__class__.__name__, self.searchDirs)
+        return "<{} {}>".format(self.__class__.__name__, self.roots)
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER = re.compile(r'(-?(?:0|[1-9][0-9]*))(\.[0-9]+)?([eE][-+]?[0-9]+)?')
+_NUMBER_CHARS = re.compile(r'[-+.eE0-9]*')
+_CONSTANTS = (
+    ('null', None), ('true', True), ('false', False),
+    ('NaN', float('nan')), ('Infinity', float('inf')), ('-Infinity', float('-inf')),
+)
+_MAX_CONSTANT_LEN = max(len(name) for (name, _) in _CONSTANTS)
+
+# States of the event reader
+_VALUE = 'value'
+_VALUE_OR_END = 'value or end'  # Right after '['
+_KEY = 'key'
+_KEY_OR_END = 'key or end'  # Right after '{'
+_NEXT = 'next'  # After a value
+
+
+class _TextReader:
+    """Text buffer of a binary JSON file that is decoded and read in chunks."""
+
+    __slots__ = ('buf', 'pos', 'offset', 'eof', '_fin', '_decoder', '_chunkSize')
+
+    def __init__(self, fin, chunk_size):
+        self._fin = fin
+        self._chunkSize = chunk_size
+        head = fin.read(max(chunk_size, 4))  # Enough to detect the encoding
+        self._decoder = codecs.getincrementaldecoder(json.detect_encoding(head[:4]))()
+        self.buf = self._decoder.decode(head, final=not head)
+        self.pos = 0
+        self.offset = 0  # Characters dropped from the start of the `buf`
+        self.eof = not head
+
+    def fill(self, min_chars=1):
+        """Drop the consumed text and read at least `min_chars` more characters (unless the file ends)."""
+        parts = [self.buf[self.pos:]]
+        self.offset += self.pos
+        self.pos = 0
+        read = 0
+        while read < min_chars and not self.eof:
+            data = self._fin.read(max(self._chunkSize, min_chars))
+            self.eof = not data
+            text = self._decoder.decode(data, final=self.eof)
+            parts.append(text)
+            read += len(text)
+        self.buf = ''.join(parts)
+
+    def peek(self):
+        """Skip the whitespace, return the next character ('' at the end of the file)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            elif self.eof:
+                return ''
+            self.fill()
+
+    def error(self, msg):
+        return ValueError(f"{msg} (char {self.offset + self.pos})")
+
+    def readString(self):
+        """Read string that starts at the current position."""
+        while True:
+            try:
+                (out, self.pos) = json.decoder.scanstring(self.buf, self.pos + 1)
+                return out
+            except ValueError:
+                # Possibly just not read in full yet
+                if self.eof:
+                    raise self.error("Invalid string")
+                self.fill(len(self.buf))
+
+    def readScalar(self):
+        """Read number/constant that starts at the current position."""
+        if len(self.buf) - self.pos <= _MAX_CONSTANT_LEN and not self.eof:
+            self.fill(_MAX_CONSTANT_LEN)
+        while not self.eof and _NUMBER_CHARS.match(self.buf, self.pos).end() == len(self.buf):
+            # The number might continue in the next chunk
+            self.fill(len(self.buf))
+        match = _NUMBER.match(self.buf, self.pos)
+        if match is not None:
+            self.pos = match.end()
+            (integer, frac, exp) = match.groups()
+            if frac or exp:
+                return float(integer + (frac or '') + (exp or ''))
+            return int(integer)
+        for (name, value) in _CONSTANTS:
+            if self.buf.startswith(name, self.pos):
+                self.pos += len(name)
+                return value
+        raise self.error("Expecting value")
+
+
+def iterJsonEvents(fin, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield (event, value) pairs of the JSON document read from the binary file `fin` in chunks.
+
+    The events are 'start_map', 'map_key' (value is the key), 'end_map', 'start_array', 'end_array' and
+        'value' (value is the scalar). The values are what `json.load` would return for the document,
+        invalid documents raise ValueError.
+    Only the current chunk of the document is kept in memory. The repeated mapping keys are shared.
+    """
+    reader = _TextReader(fin, chunk_size)
+    keys = {}
+    stack = []  # True for the mappings
+    state = _VALUE
+    while True:
+        char = reader.peek()
+        if state is _NEXT:
+            if not stack:
+                if char:
+                    raise reader.error("Extra data")
+                return
+            elif char == ',':
+                reader.pos += 1
+                state = _KEY if stack[-1] else _VALUE
+            elif char == ('}' if stack[-1] else ']'):
+                reader.pos += 1
+                yield ('end_map' if stack.pop() else 'end_array', None)
+            else:
+                raise reader.error("Expecting ',' delimiter")
+        elif state is _KEY or state is _KEY_OR_END:
+            if char == '}' and state is _KEY_OR_END:
+                reader.pos += 1
+                stack.pop()
+                yield ('end_map', None)
+                state = _NEXT
+                continue
+            elif char != '"':
+                raise reader.error("Expecting property name enclosed in double quotes")
+            key = reader.readString()
+            key = keys.setdefault(key, key)
+            if reader.peek() != ':':
+                raise reader.error("Expecting ':' delimiter")
+            reader.pos += 1
+            yield ('map_key', key)
+            state = _VALUE
+        elif char == ']' and state is _VALUE_OR_END:
+            reader.pos += 1
+            stack.pop()
+            yield ('end_array', None)
+            state = _NEXT
+        elif char == '{':
+            reader.pos += 1
+            stack.append(True)
+            yield ('start_map', None)
+            state = _KEY_OR_END
+        elif char == '[':
+            reader.pos += 1
+            stack.append(False)
+            yield ('start_array', None)
+            state = _VALUE_OR_END
+        elif char == '"':
+            yield ('value', reader.readString())
+            state = _NEXT
+        elif char:
+            yield ('value', reader.readScalar())
+            state = _NEXT
+        else:
+            raise reader.error("Expecting value")
+
+
+def decodeJsonEvents(events):
+    """Return read-only JSON data (see `util.frozen`) of the `iterJsonEvents` events.
+
+    This uses an explicit stack, so the nesting depth of the document is not limited by the python recursion limit.
+    """
+    stack = []  # (key of the container in its parent, items, is mapping)
+    key = None
+    for (event, value) in events:
+        if event == 'map_key':
+            key = value
+            continue
+        elif event == 'start_map' or event == 'start_array':
+            stack.append((key, [], event == 'start_map'))
+            continue
+        elif event == 'end_map' or event == 'end_array':
+            (key, items, is_mapping) = stack.pop()
+            value = frozen.FrozenDict(items) if is_mapping else frozen.FrozenList(items)
+        if not stack:
+            return value
+        (_, items, is_mapping) = stack[-1]
+        items.append((key, value) if is_mapping else value)
+    raise ValueError("Incomplete JSON document")
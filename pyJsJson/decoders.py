@@ -0,0 +1,94 @@
+"""JSON decoder backends (see `dataSource.FileSource`).
+
+Decoders take the raw file contents (`bytes` or a buffer such as `mmap`) and return the read-only
+    data (see `util.frozen`).
+The other decoders are optional: these are only used if the library they wrap is installed.
+"""
+
+import json
+import logging
+
+from .util import frozen
+
+logger = logging.getLogger(__name__)
+
+
+class Decoder:
+    """Base class for the JSON decoders."""
+
+    name = 'unknown'
+
+    @classmethod
+    def isAvailable(cls):
+        """Return True if the decoder can be used in this environment."""
+        return True
+
+    def decode(self, data):
+        """Return read-only JSON data decoded from the `data` bytes/buffer."""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.name!r}>"
+
+
+class StdlibDecoder(Decoder):
+    """`json` module decoder. The objects are frozen as they are decoded (using the `object_pairs_hook`),
+        so only the lists are left to be frozen afterwards.
+    """
+
+    name = 'json'
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder(object_pairs_hook=frozen.freezePairs)
+
+    def decode(self, data):
+        encoding = json.detect_encoding(bytes(data[:4]))
+        return frozen.freezeDecoded(self._decoder.decode(str(data, encoding)))
+
+
+class OrjsonDecoder(Decoder):
+    """`orjson` decoder.
+
+    `orjson` is stricter than the `json` module (e.g. it does not accept NaN or integers above 64 bits),
+        such documents are decoded by the `fallback` decoder.
+    `orjson` produces plain (mutable) objects, these are frozen by `frozen.freezeLoaded` that copies
+        the containers as they are and only walks the nested ones.
+    """
+
+    name = 'orjson'
+
+    @classmethod
+    def isAvailable(cls):
+        try:
+            import orjson  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def __init__(self, fallback=None):
+        import orjson
+        self._loads = orjson.loads
+        self._fallback = fallback or StdlibDecoder()
+
+    def decode(self, data):
+        try:
+            with memoryview(data) as view:
+                out = self._loads(view)
+        except ValueError:
+            logger.debug("orjson failed to decode the document, falling back to the json module")
+            return self._fallback.decode(data)
+        return frozen.freezeLoaded(out)
+
+
+DECODERS = (OrjsonDecoder, StdlibDecoder)  # In the order of preference (fastest first, see the benchmarks)
+
+
+def getDecoder(name=None):
+    """Return new decoder `name` (or the preferred one of the available decoders if no name is given)."""
+    for decoder_cls in DECODERS:
+        if name is None or decoder_cls.name == name:
+            if decoder_cls.isAvailable():
+                return decoder_cls()
+            elif name is not None:
+                raise ValueError(f"JSON decoder {name!r} is not available")
+    raise ValueError(f"Unknown JSON decoder {name!r} (known decoders: {[el.name for el in DECODERS]})")
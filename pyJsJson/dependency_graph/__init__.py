@@ -1,4 +1,5 @@
 """Classes that represent expansion trees."""
 
 
-from .construct import construct
+from .construct import construct, constructFromEvents, indexConstructors
+from .pointer import PointerIndex
@@ -6,8 +6,8 @@ import copy
 import collections.abc
 
 from .. import util, exceptions
+from ..util import frozen
 
-NEG_INF = float('-Inf')
 
 class ExpansionRvCode(enum.IntEnum):
 
@@ -21,8 +21,46 @@ class ExpansionRvCode(enum.IntEnum):
 ExpansionRv = collections.namedtuple('_ExpansionRv', ['state', 'result'])
 
 
+class NodeName:
+    """Name of a dependency graph node (e.g. 'root.key[3].sub').
+
+    The name string is only rendered on request, so constructing deeply nested graphs
+        does not cost O(depth) per node.
+    """
+
+    __slots__ = ('parent', 'key', 'isIndex')
+
+    def __init__(self, parent, key, isIndex=False):
+        self.parent = parent  # Either parent `NodeName` or the root name string
+        self.key = key
+        self.isIndex = isIndex
+
+    def __str__(self):
+        parts = []
+        name = self
+        while isinstance(name, NodeName):
+            parts.append(f"[{name.key}]" if name.isIndex else f".{name.key}")
+            name = name.parent
+        parts.append(str(name))
+        return ''.join(reversed(parts))
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return repr(str(self))
+
+
 class BaseDependencyObject:
-    """Base class for all dependency graph objects."""
+    """Base class for all dependency graph objects.
+
+    Graphs can have millions of nodes, so all of the node classes have `__slots__`.
+    """
+
+    __slots__ = ('name', 'data')
 
     def __init__(self, name, data):
         self.name = name
@@ -42,67 +80,348 @@ class BaseDependencyObject:
     def getPlainObject(self):
         raise NotImplementedError
 
+    def iterStaticReferences(self):
+        """Yield paths of the files this object itself will (most likely) load, relative to its tree."""
+        return ()
+
+
+def iterStaticReferences(graph):
+    """Yield paths of the files the objects of the `graph` statically reference (see `iterStaticReferences`)."""
+    stack = [graph]
+    while stack:
+        node = stack.pop()
+        yield from node.iterStaticReferences()
+        if isinstance(node, Mapping):
+            stack.extend(node.data.values())
+        elif isinstance(node, Tuple):
+            stack.extend(node.data)
+
 
 class Primitive(BaseDependencyObject):
-    """Primitive data object - has no dependencies."""
+    """Primitive data object - has no dependencies.
+
+    Primitives are immutable, so the constructed graphs share them (see `Primitive.shared`).
+    """
+
+    __slots__ = ()
+
+    _shared = {}  # (type, value) -> shared Primitive
 
     @classmethod
     def match(cls, obj):
         return isinstance(obj, (float, int, str, None.__class__))
 
+    @classmethod
+    def shared(cls, data):
+        """Return the shared (anonymous) node of the common `data` value or a new anonymous node."""
+        try:
+            return cls._shared[(data.__class__, data)]
+        except KeyError:
+            return cls(name=None, data=data)
+
     def doExpand(self, namespace):
         return ExpansionRv(ExpansionRvCode.SUCCESS, self)
 
     def getPlainObject(self):
         return self.data
 
-class Tuple(BaseDependencyObject):
+
+class Literal(BaseDependencyObject):
+    """Container (mapping/array) with no commands in it - has no dependencies.
+
+    The original python object is kept as-is (and it is never walked during the expansion), so the whole
+        subtree is a single node. The object may be shared (e.g. with the parsed file or the caller's data),
+        so `getPlainObject` returns a mutable copy of it.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def match(cls, obj):
+        return False  # Only created by the construction (which knows there are no commands in the `obj`)
+
+    def doExpand(self, namespace):
+        return ExpansionRv(ExpansionRvCode.SUCCESS, self)
+
+    def getPlainObject(self):
+        return frozen.thaw(self.data)
+
+
+class _ChildUri:
+    """URI of the child `anchor` of the `namespace`. Only computed if someone asks for it.
+
+    The pending URIs of the ancestors are resolved in a loop (rather than by nested lookups),
+        so the nesting depth is not limited by the python recursion limit.
+    """
+
+    __slots__ = ('namespace', 'anchor')
+
+    def __init__(self, namespace, anchor):
+        self.namespace = namespace
+        self.anchor = anchor
+
+    def __call__(self):
+        pending = [(None, self.anchor)]  # (own vars of the namespace, anchor)
+        namespace = self.namespace
+        while True:
+            own_uri = namespace.var._var.get('uri')
+            if own_uri.__class__ is util.LazyValue and own_uri.fn.__class__ is _ChildUri:
+                pending.append((namespace.var._var, own_uri.fn.anchor))
+                namespace = own_uri.fn.namespace
+            elif own_uri is None and namespace.parent is not None:
+                namespace = namespace.parent  # Inherits the URI
+            else:
+                break
+        uri = namespace.var.uri
+        for (own_vars, anchor) in reversed(pending):
+            uri = uri.appendAnchor(anchor)
+            if own_vars is not None:
+                own_vars['uri'] = uri
+        return uri
+
+
+def _lazyChildUri(namespace, anchor):
+    return util.LazyValue(_ChildUri(namespace, anchor))
+
+
+class _Progress:
+    """Expansion state of a container whose children are not all expanded yet."""
+
+    __slots__ = ('keys', 'children', 'pending', 'result')
+
+    def __init__(self, keys, children, pending, result):
+        self.keys = keys  # Keys of the children in the result object
+        self.children = children  # tuple of child nodes
+        self.pending = pending  # indices of the children that are not expanded yet
+        self.result = result  # Expansion result (updated in-place as the pending children get expanded)
+
+
+class _Container(BaseDependencyObject):
+    """Base class for dependency objects that have children.
+
+    Successfully expanded children are never expanded again: the following expansions only visit
+        the pending children and the result of a fully expanded container is memoized.
+    """
+
+    __slots__ = ('_childNs', '_progress', '_doneRv')
+
+    def __init__(self, name, data):
+        super(_Container, self).__init__(name, data)
+        self._childNs = None  # (parent namespace, child namespaces) of the last expansion
+        self._progress = None  # `_Progress` while some children are pending
+        self._doneRv = None  # Memoized successful expansion result
+
+    def _iterChildNamesAndAnchors(self):
+        """Yield (namespace name, uri anchor) for every child."""
+        raise NotImplementedError
+
+    def _getChildren(self):
+        """Return tuple of child nodes."""
+        raise NotImplementedError
+
+    def _newResult(self, results):
+        """Return expansion result object for the list of `results` of the children."""
+        raise NotImplementedError
+
+    def _getChildKeys(self):
+        """Return sequence of the keys of the children in the expansion result object."""
+        raise NotImplementedError
+
+    def _finishResult(self, result):
+        """Return final version of the expansion `result` once all of the children are expanded."""
+        return result
+
+    def _getChildNamespaces(self, namespace):
+        """Return namespaces for the children of this object (None for the primitive and literal children).
+
+        These are reused as long as this object is expanded within the same parent namespace.
+        """
+        cached = self._childNs
+        if cached is None or cached[0] is not namespace:
+            cached = self._childNs = (namespace, tuple(
+                None if isinstance(child, (Primitive, Literal)) else namespace.newChild(
+                    name=name,
+                    var={
+                        'uri': _lazyChildUri(namespace, anchor),
+                    }
+                )
+                for (child, (name, anchor)) in zip(self._getChildren(), self._iterChildNamesAndAnchors())
+            ))
+        return cached[1]
+
+    def _expandChildren(self, namespace):
+        """Expand the children of this object.
+
+        The plain (Mapping/Tuple) descendants are expanded by this loop (using an explicit stack),
+            so the depth of the graph is not limited by the python recursion limit. Other children
+            (e.g. the commands) are expanded by their own `doExpand`.
+        """
+        if self._doneRv is not None:
+            return self._doneRv
+        stats = namespace.root.stats
+        stack = [_ExpansionFrame(self, namespace)]
+        while True:
+            frame = stack[-1]
+            if frame.pos < len(frame.indices):
+                idx = frame.indices[frame.pos]
+                child = frame.children[idx]
+                if child.__class__ in _PLAIN_CONTAINERS and child._doneRv is None:
+                    stack.append(_ExpansionFrame(child, frame.namespaces[idx]))
+                    continue
+                frame.addResult(idx, child.doExpand(frame.namespaces[idx]))
+                continue
+            stack.pop()
+            rv = frame.node._finishExpansion(frame, stats)
+            if not stack:
+                return rv
+            parent = stack[-1]
+            parent.addResult(parent.indices[parent.pos], rv)
+
+    def _finishExpansion(self, frame, stats):
+        """Return expansion result of this object once the `frame` has expanded all of its (pending) children."""
+        stats.nodesVisited += len(frame.indices)
+        progress = self._progress
+        if progress is None:
+            # The first expansion
+            result = self._newResult(frame.results)
+            if frame.stillPending:
+                self._progress = _Progress(self._getChildKeys(), frame.children, frame.stillPending, result)
+        else:
+            result = progress.result
+            progress.pending = frame.stillPending
+
+        if frame.rvCode == ExpansionRvCode.SUCCESS:
+            out = self._doneRv = ExpansionRv(frame.rvCode, self._finishResult(result))
+            # Not needed anymore
+            self._progress = None
+            self._childNs = None
+        else:
+            out = ExpansionRv(frame.rvCode, result)
+        return out
+
+
+class _ExpansionFrame:
+    """A container whose children are being expanded (see `_Container._expandChildren`)."""
+
+    __slots__ = ('node', 'namespaces', 'children', 'indices', 'pos', 'results', 'progress', 'rvCode', 'stillPending')
+
+    def __init__(self, node, namespace):
+        self.node = node
+        self.namespaces = node._getChildNamespaces(namespace)
+        self.progress = progress = node._progress
+        if progress is None:
+            # The first expansion: all of the children
+            self.children = node._getChildren()
+            self.indices = range(len(self.children))
+        else:
+            self.children = progress.children
+            self.indices = progress.pending
+        self.pos = 0  # Position in the `indices`
+        self.results = []  # Results of the children (the first expansion only)
+        self.rvCode = ExpansionRvCode.SUCCESS  # Empty containers are expanded by definition
+        self.stillPending = []
+
+    def addResult(self, idx, child_rv):
+        """Record expansion result of the child `idx` (the current one)."""
+        if self.progress is None:
+            self.results.append(child_rv.result)
+        else:
+            self.progress.result.data[self.progress.keys[idx]] = child_rv.result
+        if child_rv.state != ExpansionRvCode.SUCCESS:
+            self.rvCode = max(self.rvCode, child_rv.state)
+            self.stillPending.append(idx)
+        self.pos += 1
+
+
+class Tuple(_Container):
+
+    __slots__ = ()
 
     @classmethod
     def match(cls, obj):
         return isinstance(obj, (list, tuple))
 
+    def _iterChildNamesAndAnchors(self):
+        for idx in range(len(self.data)):
+            yield (f"[{idx}]", str(idx))
+
+    def _getChildren(self):
+        return self.data
+
+    def _newResult(self, results):
+        return Tuple(self.name, results)
+
+    def _getChildKeys(self):
+        return range(len(self.data))
+
+    def _finishResult(self, result):
+        return Tuple(self.name, tuple(result.data))
+
     def doExpand(self, namespace):
-        rv_code = NEG_INF
-        rv_data = []
-        for (idx, value) in enumerate(self.data):
-            with namespace.child(
-                name=f"[{idx}]",
-                var={
-                    'uri': namespace.var.uri.appendAnchor(str(idx)),
-                }
-            ) as child_ns:
-                value_exp = value.doExpand(child_ns)
+        return self._expandChildren(namespace)
+
+    def getPlainObject(self):
+        return _plainObject(self)
 
-            rv_code = max(rv_code, value_exp.state)
-            rv_data.append(value_exp.result)
-        return ExpansionRv(rv_code, Tuple(self.name, tuple(rv_data)))
 
+class Mapping(_Container):
 
-class Mapping(BaseDependencyObject):
+    __slots__ = ()
 
     @classmethod
     def match(cls, obj):
         return isinstance(obj, collections.abc.Mapping)
 
+    def _iterChildNamesAndAnchors(self):
+        for key in self.data.keys():
+            yield (key, key)
+
+    def _getChildren(self):
+        return tuple(self.data.values())
+
+    def _newResult(self, results):
+        return Mapping(self.name, dict(zip(self.data.keys(), results)))
+
+    def _getChildKeys(self):
+        return tuple(self.data.keys())
+
     def doExpand(self, namespace):
-        rv_code = NEG_INF
-        rv_data = {}
-        for (key, value) in self.data.items():
-            with namespace.child(
-                name=key,
-                var={
-                    'uri': namespace.var.uri.appendAnchor(key),
-                }
-            ) as child_ns:
-                value_exp = value.doExpand(child_ns)
-
-            rv_code = max(rv_code, value_exp.state)
-            rv_data[key] = value_exp.result
-        return ExpansionRv(rv_code, Mapping(self.name, rv_data))
+        return self._expandChildren(namespace)
 
     def getPlainObject(self):
-        return dict(
-            (key, value.getPlainObject())
-            for (key, value) in self.data.items()
-        )
\ No newline at end of file
+        return _plainObject(self)
+
+
+_PLAIN_CONTAINERS = (Mapping, Tuple)  # Exact classes (not the commands)
+
+
+def _plainObject(node):
+    """Return plain python object of the (Mapping/Tuple) `node`, without recursion for its plain descendants."""
+
+    def _newFrame(node):
+        if isinstance(node, Mapping):
+            out = {}
+            return (out, iter(node.data.items()), out.__setitem__)
+        out = []
+        return (out, iter(enumerate(node.data)), lambda key, value: out.append(value))
+
+    root = _newFrame(node)
+    stack = [root]
+    while stack:
+        (_, items, add) = stack[-1]
+        for (key, value) in items:
+            if value.__class__ in _PLAIN_CONTAINERS:
+                frame = _newFrame(value)
+                add(key, frame[0])
+                stack.append(frame)
+                break
+            add(key, value.getPlainObject())
+        else:
+            stack.pop()
+    return root[0]
+
+
+Primitive._shared.update(
+    ((value.__class__, value), Primitive(name=None, data=value))
+    for value in [None, True, False, ''] + list(range(-1, 257))
+)
@@ -1,46 +1,249 @@
-# from . import (
-#     JsonTreeRoot,
-#     DictTree, ListTree,
-# )
+"""Construction of the dependency graphs out of python (JSON) data."""
 
 import collections.abc
+import contextlib
+import gc
 
 from . import base
+from .. import exceptions
+from ..util import frozen
 
+_PRIMITIVE_TYPES = frozenset((str, int, float, bool, type(None)))
+_ARRAY_TYPES = (list, tuple)
 
 
-def remap_python_objects(data, prefix, constructurs):
-    """Remaps input 'data' into dependency graph objects."""
-    if isinstance(data, collections.abc.Mapping):
-        recurse_results = dict(
-            (key, remap_python_objects(value, f"{prefix}.{key}", constructurs))
-            for (key, value) in data.items()
-        )
-    elif isinstance(data, (list, tuple)):
-        recurse_results = tuple(
-            remap_python_objects(value, f"{prefix}[{idx}]", constructurs)
-            for (idx, value) in enumerate(data)
+def _isPrimitive(obj):
+    return (obj.__class__ in _PRIMITIVE_TYPES) or base.Primitive.match(obj)
+
+
+class _Frame:
+    """A container that is being constructed.
+
+    The primitive `children` are kept as plain values until the frame is finished, as these are only
+        wrapped into nodes if the container turns out not to be a literal.
+    The `data` is None for the containers constructed out of JSON events (see `remap_json_events`),
+        their python data is only built if they are literals.
+    """
+
+    __slots__ = ('name', 'data', 'items', 'children', 'isMapping', 'parentKey', 'isLiteral')
+
+    def __init__(self, name, parentKey, isMapping, data=None):
+        self.name = name
+        self.data = data
+        self.parentKey = parentKey
+        self.isLiteral = True  # No command anywhere within the `data` (so far)
+        self.isMapping = isMapping
+        if isMapping:
+            self.items = None if data is None else iter(data.items())
+            self.children = {}
+        else:
+            self.items = None if data is None else enumerate(data)
+            self.children = []
+
+
+def _attach(parent, key, node):
+    """Add constructed child `node` to the `parent` frame."""
+    if node.__class__ is not base.Literal:
+        parent.isLiteral = False
+    if parent.isMapping:
+        parent.children[key] = node
+    else:
+        parent.children.append(node)
+
+
+def _toNode(child):
+    return child if isinstance(child, base.BaseDependencyObject) else base.Primitive.shared(child)
+
+
+def _toPlain(child):
+    return child.data if child.__class__ is base.Literal else child
+
+
+def _literalData(frame):
+    """Return read-only python data of the literal `frame`."""
+    if frame.data is not None:
+        return frame.data
+    elif frame.isMapping:
+        return frozen.FrozenDict((key, _toPlain(value)) for (key, value) in frame.children.items())
+    return frozen.FrozenList(_toPlain(value) for value in frame.children)
+
+
+def indexConstructors(constructors, index=None):
+    """Return key -> constructor (command class) index of the `constructors`, added to the `index` if given.
+
+    Raises `CommandCollisionError` (and the `index` is left unchanged) if two different constructors
+        use the same key.
+    """
+    out = dict(index or ())
+    for constructor in constructors:
+        existing = out.setdefault(constructor.key, constructor)
+        if existing is not constructor:
+            raise exceptions.CommandCollisionError(constructor.key, existing, constructor)
+    if index is not None:
+        index.update(out)
+    return out
+
+
+def _finishFrame(frame, constructors, references):
+    if frame.isMapping:
+        if len(frame.children) == 1:
+            # Only single-key mappings can be commands
+            for (key, value) in frame.children.items():
+                constructor = constructors.get(key)
+                if constructor is not None:
+                    out = constructor(name=frame.name, data={key: _toNode(value)})
+                    if references is not None:
+                        references.extend(out.iterStaticReferences())
+                    return out
+        if frame.isLiteral:
+            return base.Literal(name=frame.name, data=_literalData(frame))
+        return base.Mapping(
+            name=frame.name,
+            data=dict((key, _toNode(value)) for (key, value) in frame.children.items()),
         )
+    elif frame.isLiteral:
+        return base.Literal(name=frame.name, data=_literalData(frame))
     else:
-        recurse_results = data
-    # Recurse_results must be defined now
-    for constructor in constructurs:
-        if constructor.match(recurse_results):
-            return constructor(
-                name=prefix,
-                data=recurse_results
-            )
-    # else
-    raise NotImplementedError(data, constructurs)
-
-def construct(data, name, extra_constructors=()):
-    actual_constructors = tuple(extra_constructors) + (
-        # Please note that the default dependency objects are added at the end of the
-        # actual_constructors, therefore any extra_constructors specified take precedence
-        base.Tuple, base.Mapping,
-        base.Primitive,
-    )
-    return remap_python_objects(
-        data, name,
-        actual_constructors
-    )
\ No newline at end of file
+        return base.Tuple(name=frame.name, data=tuple(_toNode(value) for value in frame.children))
+
+
+@contextlib.contextmanager
+def _gcPaused():
+    """Pause the garbage collector.
+
+    Construction only creates new objects that are all reachable, so GC passes triggered by
+        the allocations are pure overhead (and they get slower as the graph grows).
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def remap_python_objects(data, prefix, constructors, references=None):
+    """Remaps input 'data' into dependency graph objects.
+
+    This uses an explicit stack (not recursion), so the depth of the `data` is not limited
+        by the python recursion limit.
+    The `constructors` (key -> command class, see `indexConstructors`) are only looked up for the keys
+        of the single-key mappings.
+    Containers that have no commands anywhere within them are kept as single `Literal` nodes.
+    Static file references of the constructed commands (see `iterStaticReferences`) are appended
+        to the `references` list (if one is provided).
+    """
+    if _isPrimitive(data):
+        return base.Primitive(name=prefix, data=data)
+    elif not isinstance(data, (collections.abc.Mapping, ) + _ARRAY_TYPES):
+        raise NotImplementedError(data, constructors)
+
+    out = None
+    stack = [_Frame(prefix, None, isinstance(data, collections.abc.Mapping), data)]
+    while stack:
+        frame = stack[-1]
+        is_mapping = frame.isMapping
+        children = frame.children
+        for (key, value) in frame.items:
+            if value.__class__ in _PRIMITIVE_TYPES or _isPrimitive(value):
+                # Primitive children are anonymous (and possibly shared) nodes, see `_toNode`
+                if is_mapping:
+                    children[key] = value
+                else:
+                    children.append(value)
+            elif isinstance(value, (collections.abc.Mapping, ) + _ARRAY_TYPES):
+                stack.append(_Frame(
+                    base.NodeName(frame.name, key, not is_mapping), key,
+                    isinstance(value, collections.abc.Mapping), value,
+                ))
+                break
+            else:
+                raise NotImplementedError(value, constructors)
+        else:
+            # All children of the `frame` are constructed
+            stack.pop()
+            node = _finishFrame(frame, constructors, references)
+            if stack:
+                _attach(stack[-1], frame.parentKey, node)
+            else:
+                out = node
+    return out
+
+
+def remap_json_events(events, prefix, constructors, references=None):
+    """Same as `remap_python_objects`, but the graph is constructed out of JSON `events`
+        (see `dataSource.iterJsonEvents`) as these come.
+
+    Python data is only built for the literals (read-only, see `util.frozen`), so the whole document
+        never has to be decoded.
+    """
+    stack = []
+    key = None
+    out = None
+    for (event, value) in events:
+        if event == 'map_key':
+            key = value
+            continue
+        elif not stack:
+            # The root (the reader reports anything after it as an error)
+            if event == 'value':
+                out = base.Primitive(name=prefix, data=value)
+            else:
+                stack.append(_Frame(prefix, None, event == 'start_map'))
+            continue
+
+        frame = stack[-1]
+        if event == 'value':
+            if frame.isMapping:
+                frame.children[key] = value
+            else:
+                frame.children.append(value)
+        elif event == 'start_map' or event == 'start_array':
+            if not frame.isMapping:
+                key = len(frame.children)
+            stack.append(_Frame(base.NodeName(frame.name, key, not frame.isMapping), key, event == 'start_map'))
+        else:
+            # end_map/end_array
+            stack.pop()
+            node = _finishFrame(frame, constructors, references)
+            if stack:
+                _attach(stack[-1], frame.parentKey, node)
+            else:
+                out = node
+    if out is None:
+        raise ValueError("Incomplete JSON document")
+    return out
+
+
+def _asIndex(extra_constructors):
+    if isinstance(extra_constructors, dict):
+        return extra_constructors
+    return indexConstructors(extra_constructors)
+
+
+def construct(data, name, extra_constructors=(), references=None):
+    """Construct dependency graph for the `data`.
+
+    Please note that the `extra_constructors` (commands) take precedence over the default
+        Mapping for the single-key mappings with their key.
+    The `extra_constructors` are either the command classes or their (key -> command class)
+        index (see `indexConstructors`), the latter saves re-indexing them on every call.
+    Paths of the files the graph statically references are appended to the `references` list (if provided).
+    """
+    with _gcPaused():
+        return remap_python_objects(
+            data, name,
+            _asIndex(extra_constructors),
+            references=references,
+        )
+
+
+def constructFromEvents(events, name, extra_constructors=(), references=None):
+    """Same as `construct`, but for the document given as JSON `events` (see `dataSource.iterJsonEvents`)."""
+    with _gcPaused():
+        return remap_json_events(
+            events, name,
+            _asIndex(extra_constructors),
+            references=references,
+        )
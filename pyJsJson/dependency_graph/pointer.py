@@ -0,0 +1,93 @@
+"""JSON pointer (RFC 6901) resolution within dependency graphs."""
+
+import collections.abc
+import urllib.parse
+
+from . import base
+
+
+def parsePointer(pointer, fragment=False):
+    """Return tuple of (unescaped) reference tokens of the JSON `pointer`.
+
+    Pass `fragment=True` if the `pointer` is in the URI fragment representation (percent-encoded),
+        e.g. the anchor of a $ref. Otherwise it is a plain JSON pointer string (e.g. the CLI --pointer).
+    The leading '/' is optional (so 'key/sub-key' is the same as '/key/sub-key').
+    """
+    if not pointer:
+        return ()
+    if fragment:
+        pointer = urllib.parse.unquote(pointer)
+    if pointer.startswith('/'):
+        pointer = pointer[1:]
+    return tuple(
+        token.replace('~1', '/').replace('~0', '~')
+        for token in pointer.split('/')
+    )
+
+
+def formatPointer(tokens):
+    """Return JSON pointer string of the (unescaped) reference `tokens` (inverse of `parsePointer`)."""
+    return ''.join(
+        '/' + token.replace('~', '~0').replace('/', '~1')
+        for token in tokens
+    )
+
+
+def _parseIndex(token):
+    if not token.isdigit() or (token != '0' and token.startswith('0')):
+        raise KeyError(token)
+    return int(token)
+
+
+def getChild(node, token):
+    """Return child `token` of the `node`. Raises KeyError/IndexError if there is no such child."""
+    if isinstance(node, base.Tuple):
+        return node.data[_parseIndex(token)]
+    elif isinstance(node, base.Literal):
+        data = node.data
+        if isinstance(data, collections.abc.Mapping):
+            child = data[token]
+        else:
+            child = data[_parseIndex(token)]
+        if isinstance(child, (collections.abc.Mapping, list, tuple)):
+            return base.Literal(name=None, data=child)
+        return base.Primitive.shared(child)
+    elif isinstance(node.data, dict):
+        return node.data[token]
+    raise KeyError(token)
+
+
+class PointerIndex:
+    """JSON pointer -> node index of a dependency graph.
+
+    The index is built lazily: only the paths that were asked for (and their prefixes) are indexed.
+    """
+
+    def __init__(self, root):
+        self._byPath = {(): root}  # tuple of tokens -> node
+        self._byPointer = {}  # pointer string -> node
+
+    def resolve(self, pointer):
+        """Return node the `pointer` string (in the URI fragment representation, e.g. a $ref anchor) points to."""
+        try:
+            return self._byPointer[pointer]
+        except KeyError:
+            pass
+        out = self._byPointer[pointer] = self.lookup(parsePointer(pointer, fragment=True))
+        return out
+
+    def lookup(self, path):
+        """Return node at the `path` (tuple of tokens)."""
+        by_path = self._byPath
+        try:
+            return by_path[path]
+        except KeyError:
+            pass
+        known_len = len(path) - 1
+        while path[:known_len] not in by_path:
+            known_len -= 1
+        node = by_path[path[:known_len]]
+        for idx in range(known_len, len(path)):
+            node = getChild(node, path[idx])
+            by_path[path[:idx + 1]] = node
+        return node
@@ -6,3 +6,30 @@ class PyJsJsonException(Exception):
 
 class FsError(PyJsJsonException):
     """File system-related error."""
+
+
+class ReferenceCycleError(PyJsJsonException):
+    """Trees reference each other in a cycle, so none of them can ever be expanded."""
+
+    def __init__(self, cycle):
+        super(ReferenceCycleError, self).__init__("Reference cycle: {}".format(' -> '.join(cycle)))
+        self.cycle = cycle  # Tree uris, the first one is repeated at the end
+
+
+class InvalidPointerError(PyJsJsonException):
+    """JSON pointer does not point at anything."""
+
+    def __init__(self, pointer, missing_el):
+        super(InvalidPointerError, self).__init__(f"Unable to access element {missing_el!r} of pointer {pointer!r}")
+        self.pointer = pointer
+        self.key = missing_el
+
+
+class CommandCollisionError(PyJsJsonException):
+    """Two different commands use the same key."""
+
+    def __init__(self, key, existing, new):
+        super(CommandCollisionError, self).__init__(f"Commands {existing!r} and {new!r} both use the key {key!r}")
+        self.key = key
+        self.existing = existing
+        self.new = new
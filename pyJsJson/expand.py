@@ -1,9 +1,12 @@
 """Main functional class."""
 
+import itertools
 import logging
 import os
+import time
 
 from . import (
+    exceptions,
     dataSource,
     expansion_loop,
     dependency_graph,
@@ -11,10 +14,30 @@ from . import (
     util,
     trees,
 )
+from .stats import ExpansionStats
 
 
 logger = logging.getLogger(__name__)
 
+
+def _iterTimedPasses(loop, stats):
+    """Iterate over the `loop` passes, accounting their time as the 'expand' phase.
+
+    Loading & construction of the referenced files (accounted by themselves) is excluded.
+    """
+    passes = iter(loop)
+    while True:
+        nested_before = stats.phaseTimes['load'] + stats.phaseTimes['construct']
+        start = time.perf_counter()
+        pass_rv = next(passes, None)
+        elapsed = time.perf_counter() - start
+        nested = stats.phaseTimes['load'] + stats.phaseTimes['construct'] - nested_before
+        stats.phaseTimes['expand'] += elapsed - nested
+        if pass_rv is None:
+            break
+        yield pass_rv
+
+
 class JsonExpand:
 
     def __init__(self, allowed_search_roots, follow_symlinks:bool=True):
@@ -26,65 +49,306 @@ class JsonExpand:
             follow_symlinks=follow_symlinks,
         )
         self.commandConstructors = tuple()
+        self.commandIndex = {}  # command key -> command class (see `loadCommands`)
+        self._sessionIds = itertools.count()
+        self._dataIds = itertools.count()
+        # Optional dict (tree uri string -> Tree) of the file trees shared by all expansion sessions.
+        # The entries are not validated against the files, the owner has to invalidate them (see `watch.Watcher`).
+        self.treeCache = None
+        self.resultCache = None  # Optional `result_cache.ResultCache` used by `expandFile`
 
     def loadCommands(self, newCommands):
-        self.commandConstructors += tuple(newCommands)
+        """Add the `newCommands` (command classes).
+
+        Raises `exceptions.CommandCollisionError` (and none of the commands is added) if any of them uses
+            the key of a different command.
+        """
+        newCommands = tuple(newCommands)
+        dependency_graph.indexConstructors(newCommands, index=self.commandIndex)
+        self.commandConstructors += newCommands
+
+    def expand(self, tree, search_dirs=(), max_iter=1000, stats=None, pointer=None):
+        """Expand the `tree`. `max_iter` is a max number of the expansion loop passes.
 
-    def expand(self, tree, search_dirs=(), max_iter=1000):
+        Pass an `ExpansionStats` object as `stats` to collect the statistics of the expansion process.
+        Pass a JSON `pointer` (e.g. '/services/api') to only expand (and return) the part of the tree it points to.
+        """
+        return self.expandGraph(tree, max_iter=max_iter, stats=stats, pointer=pointer).getPlainObject()
+
+    def expandFile(self, filePath, max_iter=1000, stats=None, pointer=None):
+        """Return the expanded contents of the file `filePath` (or of its part the JSON `pointer` points to).
+
+        If the `resultCache` is set, the result is looked up there first (nothing is loaded or expanded
+            on a hit) and fully expanded results are stored in it.
+        """
+        if stats is None:
+            stats = ExpansionStats()
+        cache = self.resultCache
+        if cache is None:
+            return self.expand(
+                self.loadJsonFile(filePath, stats=stats), max_iter=max_iter, stats=stats, pointer=pointer
+            )
+
+        self.fileSource.newGeneration()  # The root path has to be resolved against the current file system
+        root_key = cache.rootKey(
+            self.fileSource.resolvePath(filePath),
+            [f"{cmd.__module__}.{cmd.__qualname__}" for cmd in self.commandConstructors],
+            pointer=pointer,
+            search_roots=self.fileSource.searchRoots,
+            follow_symlinks=self.fileSource.followSymlinks,
+        )
+        try:
+            with stats.timePhase('load'):
+                out = cache.get(root_key)
+        except KeyError:
+            stats.resultCacheMisses += 1
+        else:
+            stats.resultCacheHits += 1
+            return out
+
+        started_ns = int(time.time() * 10**9)  # (not `time.time_ns()`, that is python 3.7+)
+        (tree, rest) = self._selectSubtree(self.loadJsonFile(filePath, stats=stats), pointer)
+        out = self._resolveRest(
+            self.expandGraph(tree, max_iter=max_iter, stats=stats), rest, pointer
+        ).getPlainObject()
+        if tree.lastState == dependency_graph.base.ExpansionRvCode.SUCCESS:
+            closure = tuple(tree.iterClosure())
+            cache.put(
+                root_key,
+                [util.posix_path_to_os_path(el.uri.path) for el in closure],
+                out,
+                not_modified_since_ns=started_ns,
+                missing_paths=self._shadowingPaths(
+                    [filePath] + [path for el in closure for path in el.requestedPaths]
+                ),
+            )
+        return out
+
+    def _shadowingPaths(self, paths):
+        """Return the (missing) paths that the files `paths` are looked for at before the ones they resolve to.
+
+        A file created at any of these would be used instead.
+        """
         out = []
-        iter_idx = 0
+        for path in paths:
+            resolved = self.fileSource.resolvePath(path)
+            for candidate in self.fileSource.candidatePaths(path):
+                if candidate == resolved:
+                    break
+                if not os.path.lexists(candidate):
+                    out.append(candidate)
+        return out
+
+    def expandGraph(self, tree, max_iter=1000, stats=None, pointer=None):
+        """Same as `expand`, but returns the expanded dependency graph (see `output.writeJson`)."""
+        (tree, rest) = self._selectSubtree(tree, pointer)
+        ((_, out), ) = self.expandGraphs([tree], max_iter=max_iter, stats=stats)
+        return self._resolveRest(out, rest, pointer)
+
+    def _selectSubtree(self, tree, pointer):
+        """Walk the unexpanded `tree` along the JSON `pointer`.
+
+        Returns (tree of the deepest node that is reachable without expanding anything, remaining pointer tokens).
+        The walk stops at the commands (as their expansion results are not known yet).
+        """
+        tokens = dependency_graph.pointer.parsePointer(pointer) if pointer else ()
+        node = tree.graph
+        idx = 0
+        while idx < len(tokens) and node.__class__ in (dependency_graph.base.Mapping, dependency_graph.base.Tuple):
+            try:
+                node = dependency_graph.pointer.getChild(node, tokens[idx])
+            except (KeyError, IndexError) as err:
+                raise exceptions.InvalidPointerError(pointer, err)
+            idx += 1
+        if idx == 0:
+            return (tree, tokens)
+        subtree = trees.Tree(
+            # A distinct uri (the subtree is not the whole file), the references are resolved the same way
+            uri=util.URI(tree.uri.scheme, tree.uri.path, dependency_graph.pointer.formatPointer(tokens[:idx])),
+            graph=node,
+            base_uri=tree.baseUri,
+        )
+        # Only the files the selected part references
+        subtree.staticReferences = self._resolveReferences(
+            subtree.baseUri, dependency_graph.base.iterStaticReferences(node)
+        )
+        return (subtree, tokens[idx:])
+
+    def _resolveRest(self, graph, tokens, pointer):
+        """Return node of the expanded `graph` at the remaining pointer `tokens`."""
+        if not tokens:
+            return graph
+        try:
+            return dependency_graph.PointerIndex(graph).lookup(tuple(tokens))
+        except (KeyError, IndexError) as err:
+            raise exceptions.InvalidPointerError(pointer, err)
+
+    def expandMany(self, trees, max_iter=1000, stats=None):
+        """Expand many `trees` (Tree objects or file paths) within a single expansion session.
 
+        Any files referenced by the trees are loaded and expanded once per session and their
+            results are shared between all of the trees.
+
+        Yields (tree, expansion result) pairs in the order of completion.
+        `max_iter` is a max number of the expansion loop passes.
+        """
+        for (tree, graph) in self.expandGraphs(trees, max_iter=max_iter, stats=stats):
+            yield (tree, graph.getPlainObject())
+
+    def expandGraphs(self, trees, max_iter=1000, stats=None):
+        """Same as `expandMany`, but yields expanded dependency graphs."""
+        self.fileSource.newGeneration()  # Each session sees the current state of the file system
         expansion_namespace = namespace.RootNamespace(
-            name=f"Root namespace for {tree.uri.toString()}",
+            name=f"Expansion session {next(self._sessionIds)}",
             var={
-                'root_uri': tree.uri,
-                'uri': tree.uri,
                 '_json_expander': self,
-            }
-        )
-        root_token = expansion_namespace.trees.add(self, tree)
-        loop = expansion_loop.ExpansionLoop(
-            expansion_namespace
+            },
+            stats=stats,
         )
+        expansion_trees = expansion_namespace.trees
+        pending = {}  # tree key -> list of the input trees
+        for tree in trees:
+            if isinstance(tree, str):
+                tree = expansion_namespace.loadJsonFile(tree)
+            else:
+                self.prefetchReferences(tree)
+            pending.setdefault(expansion_trees.add(self, tree), []).append(tree)
 
-        for (idx, loop_rv) in enumerate(loop):
-            if idx >= max_iter:
-                logger.warn(f"Expansion of {tree.uri} stopped by max iteration limit.")
+        def _popExpanded(keys):
+            for key in keys:
+                result = expansion_trees.getResult(key).result
+                for tree in pending.pop(key):
+                    yield (tree, result)
+
+        loop = expansion_loop.ExpansionLoop(expansion_namespace)
+        for (idx, pass_rv) in enumerate(_iterTimedPasses(loop, expansion_namespace.stats)):
+            yield from _popExpanded([
+                key for key in pending.keys()
+                if expansion_trees.isExpanded(key)
+            ])
+            if not pending:
                 break
-            if expansion_namespace.trees.isFullyExpanded():
+            if idx >= max_iter:
+                logger.warn(f"Expansion of {len(pending)} trees stopped by max iteration limit.")
                 break
-        expand_rv = expansion_namespace.trees.getResult(root_token)
-        return expand_rv.result.getPlainObject()
+        else:
+            if pending:
+                logger.warn(f"Expansion of {len(pending)} trees stalled: nothing left that can be expanded.")
+        # Report whatever is left (half-expanded)
+        yield from _popExpanded(tuple(pending.keys()))
 
-    def loadJsonFile(self, filePath):
-        """Expand a particular file."""
-        raw_json = self.fileSource.loadJsonFile(filePath)
-        return self._toTree(
-            util.URI(
-                scheme=trees.TREE_URI_SCHEME,
-                path=util.os_path_to_posix_path(filePath),
-                anchor=None
-            ),
-            raw_json
+    def getFileUri(self, filePath):
+        """Return URI of the tree that would be loaded from `filePath`."""
+        return util.URI(
+            scheme=trees.TREE_URI_SCHEME,
+            path=util.os_path_to_posix_path(self.fileSource.resolvePath(filePath)),
+            anchor=None
         )
 
+    def loadJsonFile(self, filePath, stats=None, base_uri=None):
+        """Return tree of the file `filePath`.
+
+        Relative references of the tree are resolved against the `base_uri` (the file itself by default).
+        """
+        if self.treeCache is not None:
+            uri = self.getFileUri(filePath)
+            key = trees.treeKey(uri, base_uri if base_uri is not None else uri)
+            try:
+                return self.treeCache[key]
+            except KeyError:
+                pass
+            out = self.treeCache[key] = self._loadJsonFile(filePath, stats=stats, base_uri=base_uri)
+            return out
+        return self._loadJsonFile(filePath, stats=stats, base_uri=base_uri)
+
+    def _loadJsonFile(self, filePath, stats=None, base_uri=None):
+        if stats is None:
+            stats = ExpansionStats()
+        if self.fileSource.isStreamed(filePath):
+            return self._streamJsonFile(filePath, stats, base_uri)
+        cache = self.fileSource.cache
+        (old_hits, old_misses, old_bytes) = (cache.hits, cache.misses, self.fileSource.bytesParsed)
+        try:
+            with stats.timePhase('load'):
+                raw_json = self.fileSource.loadJsonFile(filePath)
+        except MemoryError:
+            # The graph constructed from the events does not need the whole decoded document
+            logger.warning(f"{filePath!r} does not fit into the memory once decoded, constructing it while it is read")
+            return self._streamJsonFile(filePath, stats, base_uri)
+        stats.filesLoaded += 1
+        stats.cacheHits += cache.hits - old_hits
+        stats.cacheMisses += cache.misses - old_misses
+        stats.bytesParsed += self.fileSource.bytesParsed - old_bytes
+        return self._toTree(self.getFileUri(filePath), raw_json, stats=stats, base_uri=base_uri)
+
+    def _streamJsonFile(self, filePath, stats, base_uri):
+        """Construct the tree of a (big) file while it is being read (see `FileSource.iterJsonEvents`)."""
+        old_bytes = self.fileSource.bytesParsed
+        root_uri = self.getFileUri(filePath)
+        references = []
+        # Reading and construction are interleaved, so all of it is accounted as the 'construct' phase
+        with stats.timePhase('construct'):
+            graph = dependency_graph.constructFromEvents(
+                self.fileSource.iterJsonEvents(filePath),
+                name=root_uri.toString(),
+                extra_constructors=self.commandIndex,
+                references=references,
+            )
+        stats.filesLoaded += 1
+        stats.graphsConstructed += 1
+        stats.bytesParsed += self.fileSource.bytesParsed - old_bytes
+        return self._newTree(root_uri, graph, references, base_uri)
+
     def loadData(self, data):
         return self._toTree(
             util.URI(
                 scheme=trees.TREE_URI_SCHEME,
-                path='<data>',
+                path=f'<data-{next(self._dataIds)}>',  # Each data tree is unique
                 anchor=None
             ),
             data
         )
 
-    def _toTree(self, root_uri, data):
-        graph = dependency_graph.construct(
-            data,
-            name=root_uri.toString(),
-            extra_constructors=self.commandConstructors,
-        )
-        return trees.Tree(
+    def _toTree(self, root_uri, data, stats=None, base_uri=None):
+        if stats is None:
+            stats = ExpansionStats()
+        references = []
+        with stats.timePhase('construct'):
+            graph = dependency_graph.construct(
+                data,
+                name=root_uri.toString(),
+                extra_constructors=self.commandIndex,
+                references=references,
+            )
+        stats.graphsConstructed += 1
+        return self._newTree(root_uri, graph, references, base_uri)
+
+    def _newTree(self, root_uri, graph, references, base_uri=None):
+        out = trees.Tree(
             uri=root_uri,
-            graph=graph
+            graph=graph,
+            base_uri=base_uri,
         )
+        out.staticReferences = self._resolveReferences(out.baseUri, references)
+        return out
+
+    def _resolveReferences(self, base_uri, references):
+        # The same way `Namespace.loadJsonFile` resolves them
+        root_dir_path = os.path.dirname(util.posix_path_to_os_path(base_uri.path))
+        return tuple(
+            os.path.normpath(os.path.join(root_dir_path, path))
+            for path in references
+        )
+
+    def prefetchReferences(self, tree):
+        """Start loading the files the `tree` statically references in the background.
+
+        Called whenever a tree is about to be expanded, so a tree (or its part selected by a JSON pointer)
+            only prefetches the files it is going to reference.
+        """
+        if tree.staticReferences:
+            self.fileSource.prefetch(tree.staticReferences)
+
+    def close(self):
+        """Release the background resources (the prefetching threads, see `FileSource.close`)."""
+        self.fileSource.close()
@@ -1,9 +1,12 @@
 import argparse
+import concurrent.futures
+import glob
 import os
 import sys
 import contextlib
-import json
+import functools
 import logging
+import multiprocessing.util
 
 import pyJsJson
 
@@ -12,41 +15,214 @@ logger = logging.getLogger(__name__)
 
 def get_arg_parser():
     parser = argparse.ArgumentParser(description='Render JSON using a JSON template')
-    parser.add_argument('input', help='Input JSON to be rendered')
+    parser.add_argument(
+        'input', nargs='+',
+        help='Input JSON(s) to be rendered (glob patterns are expanded, "**" matches any sub-directories)'
+    )
     parser.add_argument(
         '--search-dirs',
         default=(), nargs='*',
         help='Extra directories to be included into the search path'
     )
-    parser.add_argument('--output', default='-', help='Output file ("-" for stdout)')
+    parser.add_argument('--output', default='-', help='Output file ("-" for stdout) of a single input')
+    parser.add_argument(
+        '--output-dir', default=None,
+        help='Directory to write the outputs of multiple inputs to (keeping their paths relative to each other)'
+    )
+    parser.add_argument(
+        '--jobs', '-j', default=1, type=int,
+        help='Number of worker processes (0 - one per CPU)'
+    )
+    parser.add_argument(
+        '--indent', default=4, type=int,
+        help='Number of spaces to indent the output JSON with'
+    )
+    parser.add_argument(
+        '--compact', dest='indent', action='store_const', const=None,
+        help='Write compact JSON (no indentation and whitespace)'
+    )
+    parser.add_argument(
+        '--no-sort-keys', dest='sort_keys', default=True, action='store_false',
+        help='Do not sort keys of the output JSON objects'
+    )
+    parser.add_argument(
+        '--stats', default=False, action='store_true',
+        help='Print expansion statistics to stderr'
+    )
+    parser.add_argument(
+        '--pointer', default=None,
+        help='JSON pointer (e.g. "/services/api") of the only part of the input(s) to be expanded and written'
+    )
+    parser.add_argument(
+        '--cache-dir', default=None,
+        help='Directory of the persistent expansion result cache (disabled by default)'
+    )
+    parser.add_argument(
+        '--cache-size', default=pyJsJson.result_cache.DEFAULT_MAX_BYTES, type=int,
+        help='Max size (bytes) of the --cache-dir'
+    )
+    parser.add_argument(
+        '--watch', default=False, action='store_true',
+        help='Keep running and re-render the output whenever any of the referenced files changes'
+    )
+    parser.add_argument(
+        '--poll-interval', default=pyJsJson.watch.DEFAULT_POLL_INTERVAL, type=float,
+        help='Seconds between the file modification checks of the --watch mode'
+    )
     return parser
 
 
-def main(args):
-    pyJsJson.util.logging.configureCliLogging()
-    logger.info('**** STARTED ****')
-    args = get_arg_parser().parse_args(args)
+def _writeOutput(graph, output, args, stats):
+    with contextlib.ExitStack() as stack:
+        if output == '-':
+            outf = sys.stdout
+        else:
+            outf = open(output, 'w', buffering=pyJsJson.output.DEFAULT_BUFFER_SIZE)
+            stack.enter_context(outf)  # ensure that the file will be closed
 
-    input_fname = os.path.abspath(args.input)
-    search_dirs = list(args.search_dirs)
-    search_dirs.insert(
-        0,
-        os.path.dirname(input_fname)
-    )
+        with stats.timePhase('serialize'):
+            pyJsJson.output.writeJson(graph, outf, indent=args.indent, sort_keys=args.sort_keys)
+        outf.flush()
+
+
+def _printReport(input_fname, report, many):
+    """Print the stats `report` of the input (labelled by the input name if there are `many` inputs)."""
+    if many:
+        print(f"{input_fname}:", file=sys.stderr)
+    print(report, file=sys.stderr)
+
+
+def _iterInputs(patterns):
+    """Yield absolute paths of the input files (expanding the glob `patterns`)."""
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                raise pyJsJson.exceptions.FsError(f"No files match {pattern!r}")
+            for fname in matches:
+                yield os.path.abspath(fname)
+        else:
+            yield os.path.abspath(pattern)
 
+
+def _getOutputs(inputs, args):
+    """Return list of output file names for the `inputs`."""
+    if args.output_dir is None:
+        return [args.output]
+    common_dir = os.path.commonpath([os.path.dirname(fname) for fname in inputs])
+    return [
+        os.path.join(args.output_dir, os.path.relpath(fname, common_dir))
+        for fname in inputs
+    ]
+
+
+def _newExpander(args, search_dirs):
     expand = pyJsJson.expand.JsonExpand(allowed_search_roots=search_dirs)
     expand.loadCommands(pyJsJson.commands.DEFAULT_COMMANDS)
-    tree = expand.loadJsonFile(input_fname)
+    if args.cache_dir:
+        expand.resultCache = pyJsJson.result_cache.ResultCache(args.cache_dir, max_bytes=args.cache_size)
+    return expand
 
-    out = expand.expand(tree)
 
-    with contextlib.ExitStack() as stack:
-        if args.output == '-':
-            outf = sys.stdout
+def _expandOne(expand, args, input_fname, output):
+    """Expand single input.
+
+    Returns (input, stats report or None, error message or None), the errors are reported per input.
+    """
+    stats = pyJsJson.stats.ExpansionStats()
+    try:
+        if expand.resultCache is not None:
+            out = expand.expandFile(input_fname, stats=stats, pointer=args.pointer)
         else:
-            outf = open(args.output, 'w')
-            stack.enter_context(outf)  # ensure that the file will be closed
+            tree = expand.loadJsonFile(input_fname, stats=stats)
+            out = expand.expandGraph(tree, stats=stats, pointer=args.pointer)
+        if output != '-':
+            os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        _writeOutput(out, output, args, stats)
+    except Exception as err:
+        logger.debug(f"Failed to expand {input_fname!r}", exc_info=True)
+        return (input_fname, None, f"{err.__class__.__name__}: {err}")
+    return (input_fname, stats.format() if args.stats else None, None)
+
+
+_worker = None  # JsonExpand of the worker process (see `_workerExpandOne`)
+
+
+def _workerExpandOne(args, search_dirs, job):
+    # Created on the first job of the worker process (the `initializer` of the executors is python 3.7+)
+    global _worker
+    if _worker is None:
+        _worker = _newExpander(args, search_dirs)
+        # The worker processes are shut down by the executor, there is no other place to close the expander in
+        multiprocessing.util.Finalize(_worker, _worker.close, exitpriority=10)
+    (input_fname, output) = job
+    return _expandOne(_worker, args, input_fname, output)
+
+
+def _iterResults(args, search_dirs, jobs):
+    """Yield `_expandOne` results of the (input, output) `jobs`."""
+    n_workers = min(args.jobs or os.cpu_count(), len(jobs))
+    if n_workers <= 1:
+        # In-process
+        expand = _newExpander(args, search_dirs)
+        try:
+            for (input_fname, output) in jobs:
+                yield _expandOne(expand, args, input_fname, output)
+        finally:
+            expand.close()
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as executor:
+        # A few chunks per worker: big enough to amortise the IPC, small enough to balance the load
+        chunksize = max(1, len(jobs) // (n_workers * 4))
+        yield from executor.map(
+            functools.partial(_workerExpandOne, args, search_dirs), jobs, chunksize=chunksize
+        )
+
+
+def main(args):
+    pyJsJson.util.logging.configureCliLogging()
+    logger.info('**** STARTED ****')
+    parser = get_arg_parser()
+    args = parser.parse_args(args)
+
+    try:
+        inputs = list(_iterInputs(args.input))
+    except pyJsJson.exceptions.FsError as err:
+        parser.error(str(err))
+    if len(inputs) > 1 and args.output_dir is None:
+        parser.error('--output-dir is required for multiple inputs')
+    outputs = _getOutputs(inputs, args)
+    search_dirs = list(args.search_dirs)
+    for input_dir in reversed(list(dict.fromkeys(os.path.dirname(fname) for fname in inputs))):
+        search_dirs.insert(0, input_dir)
+
+    if args.watch:
+        input_outputs = dict(zip(inputs, outputs))
+
+        def _onResult(input_fname, graph, stats):
+            _writeOutput(graph, input_outputs[input_fname], args, stats)
+            if args.stats:
+                _printReport(input_fname, stats.format(), many=len(inputs) > 1)
 
-        json.dump(out, outf, indent=4, sort_keys=True)
+        watcher = pyJsJson.watch.Watcher(
+            _newExpander(args, search_dirs), inputs,
+            on_result=_onResult,
+            poll_interval=args.poll_interval,
+            pointer=args.pointer,
+        )
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            logger.info('Interrupted')
+        return True
 
-    return True  # Report success
+    failed = 0
+    for (input_fname, report, error) in _iterResults(args, search_dirs, list(zip(inputs, outputs))):
+        if error is not None:
+            failed += 1
+            print(f"{input_fname}: {error}", file=sys.stderr)
+        elif report is not None:
+            _printReport(input_fname, report, many=len(inputs) > 1)
+    if failed:
+        logger.error(f"{failed} of {len(inputs)} inputs failed")
+    return not failed
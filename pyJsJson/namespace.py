@@ -2,82 +2,138 @@
 # These objects serve as a namespace for variables/callback functions that are provided to the commands during the expansion process.
 
 import os
-import copy
 import contextlib
 import collections.abc
 import logging
 
-from .util import posix_path_to_os_path
+from .util import posix_path_to_os_path, LazyValue
 from . import exceptions, trees
+from .stats import ExpansionStats
 
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
+
 class NamespaceVar(collections.abc.Mapping):
-    """A proxy object for Namespaces' variable read-only access."""
+    """A proxy object for Namespaces' variable read-only access.
+
+    The lookups are resolved by walking up the chain of parent namespaces, no merged dicts are built.
+    `util.LazyValue` variables are computed on the first access.
+    """
+
+    __slots__ = ('_var', '_parentVar')
 
     def __init__(self, my_vars, parent=None):
         self._var = my_vars
-        self._parentVar = parent.var if parent else {}
+        self._parentVar = parent.var if parent else None
 
     def copy(self):
         """Return copy of the namespace."""
-        return self.__class__(
-            self._var.copy(),
-            self._parentVar.copy(),
-        )
-
-    def _getMergedDict(self):
-        out = dict(self._parentVar)
-        out.update(self._var)
-        return out
+        return self.__class__(dict(self.items()))
 
     def __getattr__(self, key):
         return self[key]
 
     def __getitem__(self, key):
-        return self._getMergedDict()[key]
+        var = self
+        while var is not None:
+            out = var._var.get(key, _MISSING)
+            if out is not _MISSING:
+                if out.__class__ is LazyValue:
+                    out = var._var[key] = out.fn()
+                return out
+            var = var._parentVar
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        var = self
+        while var is not None:
+            if key in var._var:
+                return True
+            var = var._parentVar
+        return False
 
     def __iter__(self):
-        return iter(self._getMergedDict())
+        seen = set()
+        var = self
+        while var is not None:
+            for key in var._var:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+            var = var._parentVar
 
     def __len__(self):
-        return len(self._getMergedDict())
+        return sum(1 for _ in self)
+
 
 class Namespace:
+    """Expansion namespace.
+
+    The full (dotted) `name` is only rendered on request from the chain of parents.
+    """
 
-    root = property(lambda s: s.parent.root)
+    __slots__ = ('_localName', 'parent', 'root', 'var')
 
     def __init__(
         self,
         name:str, parent,
         var=None, # dict of value -> payload. Please ensure that this dict won't be mutable.
     ):
-        self.name = name
+        self._localName = name
         self.parent = parent
+        self.root = parent.root if parent is not None else self
         self.var = NamespaceVar(
             my_vars=(var or {}).copy(),
             parent=self.parent,
         )
 
+    @property
+    def name(self):
+        parts = []
+        ns = self
+        while ns is not None:
+            parts.append(ns._localName)
+            ns = ns.parent
+        return '.'.join(reversed(parts))
+
     @contextlib.contextmanager
     def child(self, name, var=None):
         """Create a child namespace."""
-        fqn = f"{self.name}.{name}"
-        child_ns = Namespace(name=fqn, parent=self, var=var)
-        yield child_ns
+        yield self.newChild(name, var=var)
+
+    def newChild(self, name, var=None):
+        """Same as `child`, but returns the namespace directly (for the namespaces that outlive a `with` block)."""
+        return Namespace(name=name, parent=self, var=var)
 
     def loadJsonFile(self, path):
         """Callback for graph objects to load json trees."""
-        root_uri_path = self.var.root_uri.path
-        root_dir_path = os.path.dirname(posix_path_to_os_path(root_uri_path))
+        root_uri = self.var.get('root_uri')
+        if root_uri is None:
+            # Not within any tree (e.g. the root namespace)
+            root_dir_path = ''
+        else:
+            root_dir_path = os.path.dirname(posix_path_to_os_path(root_uri.path))
         load_path = os.path.normpath(
             os.path.join(
                 root_dir_path,
                 path
             )
         )
-        logger.debug(f"Namespace {self} is loading {path} as {load_path}.")
-        return self.var._json_expander.loadJsonFile(load_path)
+        tree_key = self.var.get('tree_key')
+        if tree_key is not None:
+            self.root.trees.addRequest(tree_key, load_path)
+        json_expander = self.var._json_expander
+        uri = json_expander.getFileUri(load_path)
+        base_uri = root_uri if root_uri is not None else uri
+
+        def _load():
+            out = json_expander.loadJsonFile(load_path, stats=self.root.stats, base_uri=base_uri)
+            json_expander.prefetchReferences(out)
+            return out
+
+        return self.root.trees.getTree(uri, base_uri, _load)
 
     def __repr__(self):
         return f"<{self.__class__.__name__} {self.name!r}>"
@@ -85,11 +141,12 @@ class Namespace:
 
 class RootNamespace(Namespace):
 
-    root = property(lambda s: s)
+    __slots__ = ('trees', 'stats')
 
-    def __init__(self, name, **kwargs):
+    def __init__(self, name, stats=None, **kwargs):
         super(RootNamespace, self).__init__(name=name, parent=None, **kwargs)
         self.trees = trees.ExpansionTrees(self)
+        self.stats = stats if stats is not None else ExpansionStats()
 
     def setVars(self, extra_vars: dict):
         """(Root only) - add extra functions after object's creation.
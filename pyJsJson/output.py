@@ -0,0 +1,138 @@
+"""Serialisation of the expansion results.
+
+The expanded dependency graphs are encoded straight into the output file, without building
+    a plain python copy of the whole result first.
+"""
+
+import json.encoder
+
+from .dependency_graph import base
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024  # characters
+
+_END = object()
+
+_encodeString = json.encoder.encode_basestring_ascii
+
+
+def _encodeScalar(value):
+    if isinstance(value, str):
+        return _encodeString(value)
+    elif value is None:
+        return 'null'
+    elif value is True:
+        return 'true'
+    elif value is False:
+        return 'false'
+    elif isinstance(value, int):
+        return int.__repr__(value)
+    elif isinstance(value, float):
+        if value != value:
+            return 'NaN'
+        elif value == float('inf'):
+            return 'Infinity'
+        elif value == -float('inf'):
+            return '-Infinity'
+        return float.__repr__(value)
+    raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+
+def _unwrap(obj):
+    """Return plain python (possibly container) value for the `obj`.
+
+    Children of the returned containers may still be dependency graph objects.
+    """
+    if isinstance(obj, base.Mapping) or isinstance(obj, base.Tuple):
+        return obj.data
+    elif isinstance(obj, (base.Primitive, base.Literal)):
+        return obj.data
+    elif isinstance(obj, base.BaseDependencyObject):
+        return obj.getPlainObject()
+    return obj
+
+
+class _Frame:
+    """A container that is being encoded."""
+
+    __slots__ = ('items', 'isMapping', 'isFirst', 'newline')
+
+    def __init__(self, items, isMapping, newline):
+        self.items = items
+        self.isMapping = isMapping
+        self.isFirst = True
+        self.newline = newline
+
+
+def iterJsonChunks(obj, indent=None, sort_keys=False):
+    """Yield JSON-encoded chunks of the `obj` (expanded dependency graph or plain JSON data).
+
+    The output matches `json.dumps(..., indent=indent, sort_keys=sort_keys)` for the indented
+        output and `separators=(',', ':')` for the compact (`indent=None`) one.
+    """
+    key_separator = ':' if indent is None else ': '
+    newlines = []  # level -> newline + indentation string
+
+    def _newline(level):
+        if indent is None:
+            return ''
+        while len(newlines) <= level:
+            newlines.append('\n' + ' ' * (indent * len(newlines)))
+        return newlines[level]
+
+    stack = []
+
+    def _start(value):
+        """Return the first chunk of the `value` (pushing a frame if it is a non-empty container)."""
+        value = _unwrap(value)
+        if isinstance(value, dict):
+            if not value:
+                return '{}'
+            items = value.items()
+            if sort_keys:
+                items = sorted(items, key=lambda item: item[0])
+            stack.append(_Frame(iter(items), True, _newline(len(stack) + 1)))
+            return '{'
+        elif isinstance(value, (list, tuple)):
+            if not value:
+                return '[]'
+            stack.append(_Frame(iter(value), False, _newline(len(stack) + 1)))
+            return '['
+        return _encodeScalar(value)
+
+    yield _start(obj)
+    while stack:
+        frame = stack[-1]
+        item = next(frame.items, _END)
+        if item is _END:
+            stack.pop()
+            yield _newline(len(stack)) + ('}' if frame.isMapping else ']')
+            continue
+
+        if frame.isFirst:
+            frame.isFirst = False
+            prefix = frame.newline
+        else:
+            prefix = ',' + frame.newline
+
+        if frame.isMapping:
+            (key, value) = item
+            yield prefix + _encodeString(key) + key_separator
+        else:
+            value = item
+            yield prefix
+        yield _start(value)
+
+
+def writeJson(obj, fout, indent=None, sort_keys=False, buffer_size=DEFAULT_BUFFER_SIZE):
+    """Encode the `obj` into text file `fout`, writing it in chunks of about `buffer_size` characters."""
+    buffer = []
+    buffered = 0
+    for chunk in iterJsonChunks(obj, indent=indent, sort_keys=sort_keys):
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= buffer_size:
+            fout.write(''.join(buffer))
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        fout.write(''.join(buffer))
@@ -0,0 +1,218 @@
+"""Persistent (on-disk) cache of the expansion results.
+
+Works like ccache's "direct mode": every root file has a manifest that lists all of the files
+    of its $ref closure with their content hashes (and stat keys, so the unchanged files are not re-hashed).
+    It also lists the paths that were looked for in the search path before the used files and did not exist
+    (a file created there would shadow the used one).
+The stored result is only returned if all of these files still have the same contents and none of the
+    missing paths exists.
+
+Layout of the cache directory:
+
+    manifests/<root key>.json  - {"files": [[path, stat key, sha256], ...], "missing": [path, ...],
+                                  "result": <result key>}
+    results/<result key>.json  - expanded JSON (compact)
+
+All files are written atomically (write to a temporary file + rename), so concurrent users of the same
+    cache directory never see partial entries. The total size of the cache is bound by `max_bytes`,
+    the least recently used entries are evicted first.
+The total size is only scanned on the first write (and on eviction), the writes then keep track of it.
+    Entries written by the other users of the cache directory are only noticed by the next scan.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+EVICT_TO_FRACTION = 0.9  # Eviction frees some room below `max_bytes`, so it does not run on every `put`
+CACHE_FORMAT_VERSION = 3  # Bump whenever the expansion output could change for the same inputs
+
+
+def _hashFile(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fin:
+        for chunk in iter(lambda: fin.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hashStrings(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _statKey(path):
+    fstat = os.stat(path)
+    return [fstat.st_mtime_ns, fstat.st_size, fstat.st_ino]
+
+
+class ResultCache:
+    """On-disk expansion result cache (see the module docstring)."""
+
+    def __init__(self, path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = os.path.abspath(path)
+        self.maxBytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._totalBytes = None  # Tracked total size of the cache files (None until the first scan)
+        self._manifestDir = os.path.join(self.path, 'manifests')
+        self._resultDir = os.path.join(self.path, 'results')
+        for dirname in (self._manifestDir, self._resultDir):
+            os.makedirs(dirname, exist_ok=True)
+
+    def rootKey(self, root_path, command_set, pointer=None, search_roots=(), follow_symlinks=True):
+        """Return key of the root file `root_path` (or its part at the JSON `pointer`) expanded with
+            the `command_set` (list of strings).
+
+        The `search_roots` and `follow_symlinks` settings change how the references are resolved,
+            so these are part of the key too.
+        """
+        return _hashStrings(
+            str(CACHE_FORMAT_VERSION), root_path, pointer or '',
+            repr(tuple(search_roots)), repr(bool(follow_symlinks)),
+            *command_set
+        )
+
+    def get(self, root_key):
+        """Return cached expansion result of the root `root_key`. Raises KeyError if there is no valid entry."""
+        try:
+            out = self._get(root_key)
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        return out
+
+    def _get(self, root_key):
+        manifest_fname = os.path.join(self._manifestDir, f"{root_key}.json")
+        try:
+            with open(manifest_fname, 'r') as fin:
+                manifest = json.load(fin)
+        except (OSError, ValueError):
+            raise KeyError(root_key)
+
+        files = []
+        stat_changed = False
+        for (path, stat_key, content_hash) in manifest['files']:
+            try:
+                new_stat_key = _statKey(path)
+                if new_stat_key != stat_key:
+                    if _hashFile(path) != content_hash:
+                        logger.debug(f"{path!r} changed, {root_key} is not valid anymore")
+                        raise KeyError(root_key)
+                    stat_changed = True
+            except OSError:
+                raise KeyError(root_key)
+            files.append((path, new_stat_key, content_hash))
+        for path in manifest['missing']:
+            if os.path.lexists(path):
+                logger.debug(f"{path!r} was created, {root_key} is not valid anymore")
+                raise KeyError(root_key)
+
+        result_fname = os.path.join(self._resultDir, f"{manifest['result']}.json")
+        try:
+            with open(result_fname, 'r') as fin:
+                out = json.load(fin)
+            os.utime(result_fname)  # Mark as recently used
+        except (OSError, ValueError):
+            raise KeyError(root_key)
+        if stat_changed:
+            # Touched, but unchanged files. Avoid re-hashing them next time.
+            self._writeManifest(root_key, files, manifest['missing'], manifest['result'])
+        else:
+            os.utime(manifest_fname)
+        return out
+
+    def put(self, root_key, closure_paths, result, not_modified_since_ns=None, missing_paths=()):
+        """Store the expansion `result` of the root `root_key` that was expanded from the `closure_paths` files.
+
+        The result is not stored if any of the files was modified at/after `not_modified_since_ns`
+            (e.g. while the expansion was running).
+        The entry is not valid anymore once any of the `missing_paths` exists.
+        """
+        files = []
+        for path in sorted(set(closure_paths)):
+            stat_key = _statKey(path)
+            if not_modified_since_ns is not None and stat_key[0] >= not_modified_since_ns:
+                logger.debug(f"{path!r} was modified during the expansion, not caching {root_key}")
+                return
+            files.append((path, stat_key, _hashFile(path)))
+        result_key = _hashStrings(root_key, *(
+            f"{path}:{content_hash}"
+            for (path, _, content_hash) in files
+        ))
+        self._writeAtomic(
+            os.path.join(self._resultDir, f"{result_key}.json"),
+            json.dumps(result, separators=(',', ':')),
+        )
+        self._writeManifest(root_key, files, sorted(set(missing_paths)), result_key)
+        if self._totalBytes > self.maxBytes:
+            self.evict()
+
+    def _writeManifest(self, root_key, files, missing, result_key):
+        self._writeAtomic(
+            os.path.join(self._manifestDir, f"{root_key}.json"),
+            json.dumps({'files': files, 'missing': missing, 'result': result_key}),
+        )
+
+    def _writeAtomic(self, fname, text):
+        if self._totalBytes is None:
+            self._totalBytes = self.totalBytes()
+        try:
+            old_size = os.stat(fname).st_size
+        except FileNotFoundError:
+            old_size = 0
+        (fd, tmp_fname) = tempfile.mkstemp(dir=os.path.dirname(fname), prefix='.tmp-', suffix='.json')
+        try:
+            data = text.encode('utf8')
+            with os.fdopen(fd, 'wb') as fout:
+                fout.write(data)
+            size = len(data)
+            os.replace(tmp_fname, fname)
+        except BaseException:
+            os.unlink(tmp_fname)
+            raise
+        self._totalBytes += size - old_size
+
+    def _iterEntries(self):
+        """Yield (mtime, size, path) of every cache file."""
+        for dirname in (self._manifestDir, self._resultDir):
+            for entry in os.scandir(dirname):
+                if entry.name.startswith('.tmp-'):
+                    continue
+                try:
+                    fstat = entry.stat()
+                except FileNotFoundError:
+                    # Evicted by someone else
+                    continue
+                yield (fstat.st_mtime, fstat.st_size, entry.path)
+
+    def totalBytes(self):
+        """Return the total size of the cache files (scans the cache directory)."""
+        return sum(size for (_, size, _) in self._iterEntries())
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits into `EVICT_TO_FRACTION` of `maxBytes`."""
+        entries = sorted(self._iterEntries())
+        total = sum(size for (_, size, _) in entries)
+        if total > self.maxBytes:
+            for (_, size, path) in entries:
+                if total <= self.maxBytes * EVICT_TO_FRACTION:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        self._totalBytes = total
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.path!r} hits={self.hits} misses={self.misses}>"
@@ -0,0 +1,98 @@
+"""Expansion statistics."""
+
+import contextlib
+import time
+
+from .dependency_graph.base import ExpansionRvCode
+
+
+class ExpansionStats:
+    """Counters of the expansion process.
+
+    All of these are plain integer/float increments, cheap enough to be always collected.
+    Phase times are exclusive: time spent loading/constructing referenced files during the expansion
+        is not counted as the 'expand' time.
+    """
+
+    PHASES = ('load', 'construct', 'expand', 'serialize')
+
+    def __init__(self):
+        self.loopPasses = 0
+        self.nodesVisitedPerPass = []
+        self.nodesVisited = 0  # Total (across all passes)
+        self.treeResults = dict(  # ExpansionRvCode -> number of tree expansions that ended with the code
+            (code, 0) for code in ExpansionRvCode
+        )
+        self.filesLoaded = 0
+        self.cacheHits = 0
+        self.cacheMisses = 0
+        self.bytesParsed = 0
+        self.graphsConstructed = 0
+        self.resultCacheHits = 0  # See `JsonExpand.expandFile`
+        self.resultCacheMisses = 0
+        self.phaseTimes = dict((phase, 0.0) for phase in self.PHASES)
+        self._passStartVisits = 0
+
+    @property
+    def blockedBy(self):
+        return self.treeResults[ExpansionRvCode.BLOCKED_BY]
+
+    @property
+    def tryAgain(self):
+        return self.treeResults[ExpansionRvCode.TRY_AGAIN]
+
+    def startPass(self):
+        self.loopPasses += 1
+        self._passStartVisits = self.nodesVisited
+
+    def endPass(self):
+        self.nodesVisitedPerPass.append(self.nodesVisited - self._passStartVisits)
+
+    @contextlib.contextmanager
+    def timePhase(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phaseTimes[phase] += time.perf_counter() - start
+
+    def asDict(self):
+        return {
+            'loop_passes': self.loopPasses,
+            'nodes_visited': self.nodesVisited,
+            'nodes_visited_per_pass': list(self.nodesVisitedPerPass),
+            'tree_results': dict(
+                (code.name, count)
+                for (code, count) in self.treeResults.items()
+            ),
+            'files_loaded': self.filesLoaded,
+            'cache_hits': self.cacheHits,
+            'cache_misses': self.cacheMisses,
+            'bytes_parsed': self.bytesParsed,
+            'graphs_constructed': self.graphsConstructed,
+            'result_cache_hits': self.resultCacheHits,
+            'result_cache_misses': self.resultCacheMisses,
+            'phase_times': dict(self.phaseTimes),
+        }
+
+    def format(self):
+        """Return human-readable report."""
+        out = [
+            f"loop passes:        {self.loopPasses}",
+            f"nodes visited:      {self.nodesVisited} (per pass: {self.nodesVisitedPerPass})",
+            "tree results:       " + ', '.join(
+                f"{code.name}={count}" for (code, count) in self.treeResults.items()
+            ),
+            f"files loaded:       {self.filesLoaded}",
+            f"cache hits/misses:  {self.cacheHits}/{self.cacheMisses}",
+            f"bytes parsed:       {self.bytesParsed}",
+            f"graphs constructed: {self.graphsConstructed}",
+            f"result cache:       {self.resultCacheHits} hits/{self.resultCacheMisses} misses",
+            "phase times:        " + ', '.join(
+                f"{phase}={seconds:.6f}s" for (phase, seconds) in self.phaseTimes.items()
+            ),
+        ]
+        return '\n'.join(out)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.asDict()!r}>"
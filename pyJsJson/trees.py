@@ -1,42 +1,92 @@
 """Expansion trees (root data objects)."""
 
+import collections
 import logging
+import posixpath
 
 from .dependency_graph.base import (
     BaseDependencyObject,
     ExpansionRvCode,
     ExpansionRv,
 )
+from .dependency_graph.pointer import PointerIndex
+from . import exceptions
 
 TREE_URI_SCHEME = 'expand.tree.uri'
 
 logger = logging.getLogger(__name__)
 
+
+def treeKey(uri, base_uri):
+    """Return string that identifies the tree of the `uri` whose relative references are resolved against `base_uri`.
+
+    The relative references are resolved relative to the input (top-level) tree, so the same file is a different
+        tree for the inputs in different directories.
+    """
+    base_dir = posixpath.dirname(base_uri.path)
+    if base_dir == posixpath.dirname(uri.path):
+        return uri.toString()
+    return f"{uri.toString()} (relative to {base_dir or 'the search roots'})"
+
+
 class Tree:
 
-    def __init__(self, uri, graph):
+    def __init__(self, uri, graph, base_uri=None):
         self.uri = uri
+        self.baseUri = base_uri if base_uri is not None else uri  # Relative references are resolved against this
+        self.key = treeKey(uri, self.baseUri)
         self.graph = graph
+        self.dependencies = {}  # tree key -> Tree this tree references
+        self.lastState = None  # ExpansionRvCode of the last expansion
+        self.staticReferences = ()  # Paths of the files the `graph` statically references (to be prefetched)
+        self.requestedPaths = set()  # Paths of the files the expansion asked for (including the missing/broken ones)
         self._cb = []
 
     def addExpandCallback(self, fn):
         assert callable(fn), fn
         self._cb.append(fn)
 
+    def iterClosure(self):
+        """Yield this tree and all of the trees it (transitively) references."""
+        seen = {id(self)}
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            yield tree
+            for dependency in tree.dependencies.values():
+                if id(dependency) not in seen:
+                    seen.add(id(dependency))
+                    stack.append(dependency)
+
     def doExpand(self, *args, **kwargs):
         rv = self.graph.doExpand(*args, **kwargs)
+        self.lastState = rv.state
         for fn in tuple(self._cb):
             fn(rv)
         return rv
 
 
 class ExpansionTrees:
-    """Object to manage expansion trees inside the root namespace."""
+    """Object to manage expansion trees inside the root namespace.
+
+    This object is also a worklist scheduler for the expansion loop: a tree that is BLOCKED_BY
+    other trees is parked until one of these trees gets expanded. Only the trees that can make progress
+    are returned by `popReady()`.
+
+    The wait-for graph (`_blockedOn`) is checked for cycles whenever a new edge is added,
+    so a reference cycle raises `ReferenceCycleError` as soon as it forms.
+    """
 
     def __init__(self, namespace):
         self.namespace = namespace
-        self._targets = {} # key -> tree
-        self._results = {} # Cache of already existing results.
+        self._targets = {}  # key -> tree
+        self._loaded = {}  # tree key -> tree (see `getTree`)
+        self._pointerIndexes = {}  # key -> PointerIndex of the expanded tree
+        self._results = {}  # Cache of already existing results.
+        self._namespaces = {}  # key -> namespace the tree is expanded in
+        self._ready = {}  # key -> None (an ordered set) of the trees to be expanded on the next pass
+        self._waiters = collections.defaultdict(set)  # key -> keys of the trees that are blocked by it
+        self._blockedOn = collections.defaultdict(set)  # key -> keys of the trees it is blocked by
 
     def __repr__(self):
         return f"<{self.__class__.__name__} of {self.namespace!r}>"
@@ -44,6 +94,18 @@ class ExpansionTrees:
     def getResult(self, key):
         return self._results[key]
 
+    def resolvePointer(self, key, pointer):
+        """Return node the JSON `pointer` points to within the expansion result of (expanded) tree `key`.
+
+        Raises KeyError/IndexError if the pointer is invalid.
+        """
+        try:
+            index = self._pointerIndexes[key]
+        except KeyError:
+            assert self.isExpanded(key), key
+            index = self._pointerIndexes[key] = PointerIndex(self._results[key].result)
+        return index.resolve(pointer)
+
     def isExpanded(self, key):
         try:
             my_code = self._results[key].state
@@ -51,14 +113,107 @@ class ExpansionTrees:
             return False
         return my_code == ExpansionRvCode.SUCCESS
 
+    def getTree(self, uri, base_uri, load_fn):
+        """Return the tree for the `uri` (see `treeKey`), calling `load_fn()` to create it only on the first request."""
+        key = treeKey(uri, base_uri)
+        try:
+            out = self._loaded[key]
+        except KeyError:
+            logger.debug(f"Loading tree {key}")
+            out = self._loaded[key] = load_fn()
+        return out
+
     def add(self, owner, tree):
         """The `owner` asks for the `tree` to be expanded as part of the current expansion process."""
-        logger.debug(f"{owner!r} registered tree {tree} for expansion")
-        key = f"[{self.namespace.name}]::[{tree.uri.toString()}]"
-        self._targets.setdefault(key, tree) # will NOT change the value if it already exists
-        tree.addExpandCallback(lambda data: self._registerTreeExpandResult(key, data))
+        key = f"[{self.namespace.name}]::[{tree.key}]"
+        if key not in self._targets:
+            logger.debug(f"{owner!r} registered tree {tree} for expansion")
+            self._targets[key] = tree
+            self._namespaces[key] = self.namespace.newChild(
+                name=tree.uri.toString(),
+                var={
+                    'tree_key': key,
+                    'root_uri': tree.baseUri,  # Relative paths are resolved relative to the input tree
+                    'uri': tree.uri,
+                }
+            )
+            self._ready[key] = None
         return key
 
+    def addRequest(self, key, path):
+        """Record that the tree `key` asked for the file `path` (whether it can be loaded or not)."""
+        self._targets[key].requestedPaths.add(path)
+
+    def addDependency(self, key, dependency_key):
+        """Record that the tree `key` references the tree `dependency_key`."""
+        dependency = self._targets[dependency_key]
+        self._targets[key].dependencies[dependency.key] = dependency
+
+    def waitFor(self, waiter, key):
+        """Record that the tree `waiter` is BLOCKED_BY the tree `key`.
+
+        Raises `ReferenceCycleError` if `key` is (transitively) blocked by the `waiter`.
+        """
+        assert key in self._targets, key
+        if self.isExpanded(key):
+            # Already there. Let the waiter try again.
+            self._ready[waiter] = None
+        elif key not in self._blockedOn[waiter]:
+            cycle = self._findWaitPath(key, waiter)
+            if cycle is not None:
+                raise exceptions.ReferenceCycleError(tuple(
+                    self._targets[el].uri.toString()
+                    for el in (waiter, ) + cycle
+                ))
+            self._waiters[key].add(waiter)
+            self._blockedOn[waiter].add(key)
+
+    def _findWaitPath(self, start, end):
+        """Return path (tuple of keys) from `start` to `end` in the wait-for graph or None if there is none."""
+        parents = {start: None}
+        stack = [start]
+        while stack:
+            key = stack.pop()
+            if key == end:
+                out = []
+                while key is not None:
+                    out.append(key)
+                    key = parents[key]
+                return tuple(reversed(out))
+            for blocker in self._blockedOn.get(key, ()):
+                if blocker not in parents:
+                    parents[blocker] = key
+                    stack.append(blocker)
+        return None
+
+    def popReady(self):
+        """Return keys of the trees that have to be expanded on this pass."""
+        out = tuple(self._ready)
+        self._ready.clear()
+        return out
+
+    def expand(self, key):
+        """Perform a single expansion of the tree `key`."""
+        tree = self._targets[key]
+        for blocker in self._blockedOn.pop(key, ()):
+            self._waiters[blocker].discard(key)
+        result = tree.doExpand(self._namespaces[key])
+        self._registerTreeExpandResult(key, result)
+        stats = self.namespace.stats
+        stats.nodesVisited += 1  # The root node of the tree
+        stats.treeResults[result.state] += 1
+
+        if result.state == ExpansionRvCode.SUCCESS:
+            for waiter in self._waiters.pop(key, ()):
+                self._ready[waiter] = None
+        elif result.state == ExpansionRvCode.BLOCKED_BY and self._blockedOn.get(key):
+            # Parked untill any of the blockers is expanded
+            pass
+        else:
+            # TRY_AGAIN (or BLOCKED_BY on something that is not tracked by this object)
+            self._ready[key] = None
+        return result
+
     def _registerTreeExpandResult(self, key, result):
         """Register trees' expansion result."""
         assert isinstance(result, ExpansionRv), result
@@ -79,4 +234,4 @@ class ExpansionTrees:
 
         return all_keys == self._results.keys() and all(
             self.isExpanded(key) for key in all_keys
-        )
\ No newline at end of file
+        )
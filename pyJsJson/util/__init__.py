@@ -4,3 +4,5 @@ from .uri import (
     posix_path_to_os_path, os_path_to_posix_path,
 )
 from . import collections_abc
+from . import frozen
+from .lazy import LazyValue
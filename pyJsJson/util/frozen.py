@@ -0,0 +1,176 @@
+"""Read-only JSON containers.
+
+Parsed JSON documents are shared between all of their users (see `dataSource.FileSource`), hence they
+are frozen to ensure that nobody changes the shared data by accident.
+
+The frozen containers are subclasses of `dict` and `list`, so they compare equal to and can be serialised
+just like the plain JSON data. Call `thaw()` (or `.copy()`) to get a mutable copy.
+"""
+
+
+def _readOnly(self, *args, **kwargs):
+    raise TypeError(f"{self.__class__.__name__} is read-only")
+
+
+class FrozenDict(dict):
+    """Read-only dict."""
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __ior__ = _readOnly
+    clear = pop = popitem = setdefault = update = _readOnly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self), ))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({dict.__repr__(self)})"
+
+
+class FrozenList(list):
+    """Read-only list."""
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readOnly
+    append = clear = extend = insert = pop = remove = reverse = sort = _readOnly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (self.__class__, (list(self), ))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list.__repr__(self)})"
+
+
+FROZEN_TYPES = (FrozenDict, FrozenList)
+
+
+def _isMutableContainer(obj):
+    return isinstance(obj, (dict, list, tuple)) and not isinstance(obj, FROZEN_TYPES)
+
+
+def freeze(obj):
+    """Return a frozen version of JSON-like `obj`.
+
+    Already frozen sub-containers are reused as-is (they are frozen all the way down).
+    """
+    if not _isMutableContainer(obj):
+        return obj
+
+    def _newFrame(container):
+        if isinstance(container, dict):
+            return (container, iter(container.items()), [])
+        else:
+            return (container, iter(enumerate(container)), [])
+
+    root = []
+    stack = [_newFrame(obj)]
+    while stack:
+        (src, items, collected) = stack[-1]
+        for (key, value) in items:
+            if _isMutableContainer(value):
+                collected.append(key)  # The value will be appended once it is frozen
+                stack.append(_newFrame(value))
+                break
+            collected.append(key)
+            collected.append(value)
+        else:
+            # All children are frozen
+            stack.pop()
+            if isinstance(src, dict):
+                frozen = FrozenDict(zip(collected[::2], collected[1::2]))
+            else:
+                frozen = FrozenList(collected[1::2])
+            (stack[-1][2] if stack else root).append(frozen)
+    return root[0]
+
+
+def freezePairs(pairs):
+    """`object_pairs_hook` for `json` decoders that produces frozen objects.
+
+    The nested objects were frozen by the hook already, so only the list values are walked
+        (see `freezeDecoded`).
+    """
+    out = FrozenDict(pairs)
+    if list in map(type, out.values()):
+        for (key, value) in pairs:
+            if value.__class__ is list:
+                dict.__setitem__(out, key, freezeDecoded(value))
+    return out
+
+
+def freezeDecoded(obj):
+    """Return frozen version of JSON `obj` decoded with the `freezePairs` hook (only its lists are mutable)."""
+    if obj.__class__ is not list:
+        return obj
+    if list in map(type, obj):
+        obj = [freezeDecoded(el) if el.__class__ is list else el for el in obj]
+    return FrozenList(obj)
+
+
+def _freezeLoaded(obj):
+    if obj.__class__ is dict:
+        out = FrozenDict(obj)
+        for (key, value) in obj.items():
+            if value.__class__ is dict or value.__class__ is list:
+                dict.__setitem__(out, key, _freezeLoaded(value))
+        return out
+    types = set(map(type, obj))
+    if dict in types or list in types:
+        if len(types) == 1:
+            return FrozenList(map(_freezeLoaded, obj))
+        return FrozenList([_freezeLoaded(el) if el.__class__ in (dict, list) else el for el in obj])
+    return FrozenList(obj)
+
+
+def freezeLoaded(obj):
+    """Return frozen version of JSON `obj` decoded into plain dicts and lists (e.g. by `orjson`).
+
+    Faster than `freeze` as the containers are copied by C code and only the nested containers are walked.
+    """
+    if obj.__class__ is not dict and obj.__class__ is not list:
+        return obj
+    try:
+        return _freezeLoaded(obj)
+    except RecursionError:
+        return freeze(obj)
+
+
+def thaw(obj):
+    """Return a mutable (deep) copy of JSON-like `obj`."""
+    if not isinstance(obj, (dict, list, tuple)):
+        return obj
+
+    def _newFrame(container):
+        if isinstance(container, dict):
+            out = {}
+            return (out, iter(container.items()), out.__setitem__)
+        out = []
+        return (out, iter(enumerate(container)), lambda key, value: out.append(value))
+
+    root = _newFrame(obj)
+    stack = [root]
+    while stack:
+        (_, items, add) = stack[-1]
+        for (key, value) in items:
+            if isinstance(value, (dict, list, tuple)):
+                frame = _newFrame(value)
+                add(key, frame[0])
+                stack.append(frame)
+                break
+            add(key, value)
+        else:
+            stack.pop()
+    return root[0]
@@ -0,0 +1,13 @@
+"""Lazily computed values."""
+
+
+class LazyValue:
+    """A value that is computed by calling `fn()` on the first access (see `namespace.NamespaceVar`)."""
+
+    __slots__ = ('fn', )
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.fn!r}>"
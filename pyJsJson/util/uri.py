@@ -7,6 +7,8 @@ import posixpath as pp
 class URI:
     """URI object."""
 
+    __slots__ = ('scheme', 'path', 'anchor')
+
     sep = pp.sep
 
     def __init__(self, scheme, path, anchor):
@@ -0,0 +1,145 @@
+"""Watch mode: keep the expansion results up to date with the files they were expanded from."""
+
+import itertools
+import logging
+import os
+import time
+
+from . import exceptions, trees, util
+from .stats import ExpansionStats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 0.5  # seconds
+
+
+def _statKey(path):
+    """Return (st_mtime_ns, st_size, st_ino) of the `path` or None if there is no such file."""
+    try:
+        fstat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (fstat.st_mtime_ns, fstat.st_size, fstat.st_ino)
+
+
+class Watcher:
+    """Re-expands the `inputs` whenever any file in their $ref closure changes.
+
+    The file trees are shared between the expansions (see `JsonExpand.treeCache`), so the fully expanded
+    trees of the unchanged files are reused as-is. A change of a file only invalidates its own tree and
+    the trees that (transitively) reference it (see `iterDependents`) and only the inputs among these
+    are re-expanded. The files the expansions failed to load (e.g. the missing ones) are watched as well.
+
+    `on_result(input, graph, stats)` is called with every (re-)expanded input
+        (only its part at the JSON `pointer` if one is given).
+    """
+
+    def __init__(self, expander, inputs, on_result, poll_interval=DEFAULT_POLL_INTERVAL, pointer=None):
+        if expander.treeCache is None:
+            expander.treeCache = {}
+        self.expander = expander
+        self.pollInterval = poll_interval
+        self.pointer = pointer
+        self._onResult = on_result
+        self._inputs = {}  # tree uri string -> input path
+        self._files = {}  # tree uri string -> (file path, stat key) of every watched file
+        for path in inputs:
+            uri = expander.getFileUri(path)
+            self._inputs[uri.toString()] = path
+            self._watch(uri)
+        self._dependents = {}  # tree key (or file uri string) -> keys of the trees that reference it
+        self._pending = list(self._inputs)  # Inputs to be expanded on the next refresh
+
+    def _watch(self, uri):
+        uri_str = uri.toString()
+        if uri_str not in self._files:
+            path = util.posix_path_to_os_path(uri.path)
+            self._files[uri_str] = (path, _statKey(path))
+
+    def iterDependents(self, uri_str):
+        """Yield keys of the trees that (transitively) depend on the tree (or file) `uri_str` (including itself)."""
+        seen = {uri_str}
+        stack = [uri_str]
+        while stack:
+            key = stack.pop()
+            yield key
+            for dependent in self._dependents.get(key, ()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    stack.append(dependent)
+
+    def poll(self):
+        """Return uri strings of the watched files that had changed since the last poll."""
+        out = []
+        for (uri_str, (path, stat_key)) in self._files.items():
+            new_key = _statKey(path)
+            if new_key != stat_key:
+                self._files[uri_str] = (path, new_key)
+                out.append(uri_str)
+        return out
+
+    def refresh(self):
+        """Re-expand the inputs affected by the file changes. Returns tuple of the re-expanded input paths."""
+        tree_cache = self.expander.treeCache
+        self.expander.fileSource.newGeneration()
+        affected = dict.fromkeys(self._pending)
+        self._pending = []
+        for changed in self.poll():
+            logger.info(f"{changed} changed")
+            for uri_str in self.iterDependents(changed):
+                tree_cache.pop(uri_str, None)
+                if uri_str in self._inputs:
+                    affected[uri_str] = None
+
+        out = []
+        for (uri_str, path) in self._inputs.items():
+            if uri_str not in affected:
+                continue
+            stats = ExpansionStats()
+            try:
+                graph = self.expander.expandGraph(
+                    self.expander.loadJsonFile(path, stats=stats), stats=stats, pointer=self.pointer
+                )
+            except (exceptions.PyJsJsonException, OSError, ValueError):
+                # Wait for the next change of the files
+                logger.exception(f"Unable to expand {path!r}")
+                continue
+            self._onResult(path, graph, stats)
+            out.append(path)
+        if affected:
+            self._updateIndex()
+        return tuple(out)
+
+    def _updateIndex(self):
+        # The edges are never removed: the trees that failed to expand do not know all of their dependencies,
+        #   so the ones of the previous expansions are kept (a stale edge only costs an extra re-expansion).
+        for (key, tree) in self.expander.treeCache.items():
+            self._watch(tree.uri)
+            # The trees of a file (one per resolution base, see `trees.treeKey`) depend on the file
+            self._dependents.setdefault(tree.uri.toString(), set()).add(key)
+            for dependency in tree.dependencies:
+                self._dependents.setdefault(dependency, set()).add(key)
+            # Including the files that are missing (or broken): these are re-tried once they change.
+            #   A file created earlier in the search path shadows the one that was used, so all of them are watched.
+            for path in tree.requestedPaths:
+                for candidate in self.expander.fileSource.candidatePaths(path):
+                    uri = util.URI(
+                        scheme=trees.TREE_URI_SCHEME, path=util.os_path_to_posix_path(candidate), anchor=None
+                    )
+                    self._watch(uri)
+                    self._dependents.setdefault(uri.toString(), set()).add(key)
+
+    def run(self, max_polls=None):
+        """Poll for the changes until interrupted (or for `max_polls` times). The expander is closed on exit."""
+        try:
+            for idx in itertools.count(1):
+                self.refresh()
+                if max_polls is not None and idx >= max_polls:
+                    break
+                time.sleep(self.pollInterval)
+        finally:
+            self.close()
+
+    def close(self):
+        """Release the background resources of the expander (see `JsonExpand.close`)."""
+        self.expander.close()
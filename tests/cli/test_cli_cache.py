@@ -0,0 +1,15 @@
+"""Test --cache-dir CLI option."""
+import subprocess
+
+
+def test_cli_cache(cli_popen_args, PROJECT_ROOT, tmp_path):
+    cli_popen_args['args'] += (
+        '--stats', '--cache-dir', str(tmp_path / 'cache'), f'{PROJECT_ROOT}/examples/ref.json'
+    )
+    outputs = []
+    for _ in range(2):
+        proc = subprocess.run(stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, **cli_popen_args)
+        outputs.append(proc)
+    assert b'result cache:       0 hits/1 misses' in outputs[0].stderr
+    assert b'result cache:       1 hits/0 misses' in outputs[1].stderr
+    assert outputs[0].stdout == outputs[1].stdout
@@ -0,0 +1,53 @@
+"""Test multiple CLI inputs."""
+import json
+import subprocess
+
+import pytest
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    src = tmp_path / 'src'
+    (src / 'sub').mkdir(parents=True)
+    (src / 'shared.json').write_text(json.dumps({'value': 42}))
+    for idx in range(5):
+        (src / 'sub' / f'input-{idx}.json').write_text(json.dumps({
+            'idx': idx,
+            'shared': {'$ref': 'file:../shared.json#value'},
+        }))
+    return src
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_glob_inputs(cli_popen_args, inputs, tmp_path, jobs):
+    out_dir = tmp_path / 'out'
+    cli_popen_args['args'] += (
+        str(inputs / 'sub' / '*.json'), '--search-dirs', str(inputs),
+        '--output-dir', str(out_dir), '--jobs', jobs,
+    )
+    subprocess.run(stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, **cli_popen_args)
+    for idx in range(5):
+        with open(out_dir / f'input-{idx}.json') as fin:
+            assert json.load(fin) == {'idx': idx, 'shared': 42}
+
+
+def test_failed_input(cli_popen_args, inputs, tmp_path):
+    (inputs / 'sub' / 'broken.json').write_text(json.dumps({'$ref': 'file:missing.json'}))
+    cli_popen_args['args'] += (
+        str(inputs / '**' / '*.json'), '--search-dirs', str(inputs),
+        '--output-dir', str(tmp_path / 'out'), '--jobs', '2',
+    )
+    proc = subprocess.run(stdout=subprocess.PIPE, stderr=subprocess.PIPE, **cli_popen_args)
+    assert proc.returncode == 1
+    assert b'broken.json: FsError' in proc.stderr
+    # Other inputs are still rendered (keeping the relative paths)
+    with open(tmp_path / 'out' / 'sub' / 'input-0.json') as fin:
+        assert json.load(fin) == {'idx': 0, 'shared': 42}
+    assert (tmp_path / 'out' / 'shared.json').exists()
+
+
+def test_output_dir_required(cli_popen_args, inputs):
+    cli_popen_args['args'] += (str(inputs / 'sub' / '*.json'), )
+    proc = subprocess.run(stdout=subprocess.PIPE, stderr=subprocess.PIPE, **cli_popen_args)
+    assert proc.returncode == 2
+    assert b'--output-dir is required' in proc.stderr
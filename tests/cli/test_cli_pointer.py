@@ -0,0 +1,9 @@
+"""Test --pointer CLI option."""
+import json
+import subprocess
+
+
+def test_cli_pointer(cli_popen_args, PROJECT_ROOT):
+    cli_popen_args['args'] += ('--pointer', '/ref/from', f'{PROJECT_ROOT}/examples/ref.json')
+    proc = subprocess.run(stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, **cli_popen_args)
+    assert json.loads(proc.stdout) == 'data dir'
@@ -0,0 +1,23 @@
+"""Test --stats CLI option."""
+import subprocess
+
+
+def test_cli_stats(cli_popen_args, PROJECT_ROOT):
+    cli_popen_args['args'] += ('--stats', f'{PROJECT_ROOT}/examples/ref.json')
+    proc = subprocess.run(stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, **cli_popen_args)
+    assert b'loop passes:        3' in proc.stderr
+    assert b'loop passes' not in proc.stdout
+
+
+def test_cli_watch_stats(cli_popen_args, PROJECT_ROOT, tmp_path):
+    cli_popen_args['args'] += (
+        '--watch', '--poll-interval', '0.1', '--stats', '--output', str(tmp_path / 'out.json'),
+        f'{PROJECT_ROOT}/examples/ref.json',
+    )
+    proc = subprocess.Popen(stdout=subprocess.PIPE, stderr=subprocess.PIPE, **cli_popen_args)
+    try:
+        proc.communicate(timeout=2)
+    except subprocess.TimeoutExpired:
+        proc.terminate()
+    (_, stderr) = proc.communicate()
+    assert b'loop passes:        3' in stderr
@@ -0,0 +1,28 @@
+"""Test CLI output formatting options."""
+
+import json
+import os
+import subprocess
+
+import pytest
+
+
+@pytest.mark.parametrize('extra_args, indent, sort_keys', [
+    ((), 4, True),
+    (('--indent', '2'), 2, True),
+    (('--compact', ), None, True),
+    (('--compact', '--no-sort-keys'), None, False),
+])
+def test_output_format(cli_popen_args, PROJECT_ROOT, tmp_path, extra_args, indent, sort_keys):
+    input_fname = os.path.join(PROJECT_ROOT, 'examples', 'ref.json')
+    output_fname = str(tmp_path / 'out.json')
+    cli_popen_args['args'] += (input_fname, '--output', output_fname) + extra_args
+    subprocess.check_call(**cli_popen_args)
+    with open(os.path.join(PROJECT_ROOT, 'examples', 'ref-output.json')) as fin:
+        expected = json.load(fin)
+    with open(output_fname) as fin:
+        out = fin.read()
+    assert out == json.dumps(
+        expected, indent=indent, sort_keys=sort_keys,
+        separators=(',', ':') if indent is None else (',', ': '),
+    )
@@ -1,4 +1,6 @@
 """Test $ref command. """
+import json
+
 import pytest
 
 import pyJsJson
@@ -76,28 +78,78 @@ def test_self_ref(UnittestFs, expand_data, path):
     assert out['output'] == 'hello-world'
 
 
-# def test_array_access(UnittestFs, expand_data):
-#     UnittestFs.mockFile('/unittest/target.json', {
-#         'top-key': [
-#             {'val': -1},
-#             {'val': -2},
-#             {'val': -3}
-#         ]
-#     })
-#     out = expand_data({
-#         '$ref': 'file:target.json#top-key/1/val'
-#     })
-#     assert out == -2, 'Array indeces start at zero'
-
-
-# def test_accessing_array_with_key(UnittestFs, expand_data):
-#     UnittestFs.mockFile('/unittest/target.json', {
-#         'top-key': [
-#             {'val': -1},
-#             {'val': -2},
-#             {'val': -3}
-#         ]
-#     })
-#     with pytest.raises(pyJsJson.commands.exceptions.InvalidReference):
-#         rv = expand_data({'$ref': 'file:target.json#top-key/mykey'})
-#         print("RESULT WAS {!r} INSTEAD".format(rv))
+def test_array_access(UnittestFs, expand_data):
+    UnittestFs.mockFile('/unittest/target.json', {
+        'top-key': [
+            {'val': -1},
+            {'val': -2},
+            {'val': -3}
+        ]
+    })
+    out = expand_data({
+        '$ref': 'file:target.json#top-key/1/val'
+    })
+    assert out == -2, 'Array indeces start at zero'
+
+
+def test_accessing_array_with_key(UnittestFs, expand_data):
+    UnittestFs.mockFile('/unittest/target.json', {
+        'top-key': [
+            {'val': -1},
+            {'val': -2},
+            {'val': -3}
+        ]
+    })
+    with pytest.raises(pyJsJson.commands.exceptions.InvalidReference):
+        rv = expand_data({'$ref': 'file:target.json#top-key/mykey'})
+        print("RESULT WAS {!r} INSTEAD".format(rv))
+
+
+@pytest.mark.parametrize('anchor, exp_out', [
+    ('', {'a': {'b': {'c': [0, {'d/e': 'slash', 'f~g': 'tilde', '': 'empty', 'h i': 'space'}]}}}),
+    ('/a/b/c/0', 0),
+    ('a/b/c/1/d~1e', 'slash'),
+    ('/a/b/c/1/f~0g', 'tilde'),
+    ('/a/b/c/1/', 'empty'),
+    ('/a/b/c/1/h%20i', 'space'),
+])
+def test_pointer_anchors(UnittestFs, expand_data, anchor, exp_out):
+    UnittestFs.mockFile('/unittest/target.json', {
+        'a': {'b': {'c': [0, {'d/e': 'slash', 'f~g': 'tilde', '': 'empty', 'h i': 'space'}]}}
+    })
+    out = expand_data({'$ref': f'file:target.json#{anchor}'})
+    assert out == exp_out
+
+
+@pytest.mark.parametrize('anchor', [
+    'a/b/c/2',
+    'a/b/c/01',
+    'a/b/c/-1',
+    'a/b/c/0/x',
+])
+def test_invalid_pointer_anchors(UnittestFs, expand_data, anchor):
+    UnittestFs.mockFile('/unittest/target.json', {'a': {'b': {'c': [0]}}})
+    with pytest.raises(pyJsJson.commands.exceptions.InvalidReference):
+        expand_data({'$ref': f'file:target.json#{anchor}'})
+
+
+def test_relative_to_input(tmp_path):
+    """Relative references are resolved relative to the input file (not the file that contains them)."""
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'root.json').write_text(json.dumps({'$ref': 'file:sub/mid.json'}))
+    (tmp_path / 'sub' / 'mid.json').write_text(json.dumps({'$ref': 'file:where.json'}))
+    (tmp_path / 'where.json').write_text(json.dumps({'where': 'top'}))
+    (tmp_path / 'sub' / 'where.json').write_text(json.dumps({'where': 'sub'}))
+    expander = pyJsJson.expand.JsonExpand(allowed_search_roots=[str(tmp_path)])
+    expander.loadCommands(pyJsJson.commands.DEFAULT_COMMANDS)
+
+    assert expander.expandFile(str(tmp_path / 'root.json')) == {'where': 'top'}
+    # The same file is expanded differently for the inputs in different directories, even within a batch
+    results = dict(
+        (tree.uri.path, result)
+        for (tree, result) in expander.expandMany([str(tmp_path / 'root.json'), str(tmp_path / 'sub' / 'mid.json')])
+    )
+    assert results == {
+        str(tmp_path / 'root.json'): {'where': 'top'},
+        str(tmp_path / 'sub' / 'mid.json'): {'where': 'sub'},
+    }
@@ -0,0 +1,65 @@
+"""Test the JSON decoder backends."""
+import json
+
+import pytest
+
+import pyJsJson
+from pyJsJson import decoders
+from pyJsJson.util import frozen
+
+DOCUMENT = {'a': [1, 2.5, {'b': None}], 'c': 'unicode ☃', 'd': True}
+
+
+def _available():
+    return [cls.name for cls in decoders.DECODERS if cls.isAvailable()]
+
+
+@pytest.mark.parametrize('name', _available())
+def test_decode(name):
+    out = decoders.getDecoder(name).decode(json.dumps(DOCUMENT).encode('utf8'))
+    assert out == DOCUMENT
+    assert isinstance(out, frozen.FrozenDict)
+    assert isinstance(out['a'], frozen.FrozenList)
+    assert isinstance(out['a'][2], frozen.FrozenDict)
+
+
+@pytest.mark.parametrize('name', _available())
+def test_decode_non_strict_json(name):
+    # Accepted by the `json` module, so accepted by all of the decoders
+    out = decoders.getDecoder(name).decode(b'{"nan": NaN, "big": 123456789012345678901234567890}')
+    assert out['big'] == 123456789012345678901234567890
+
+
+def test_decode_utf16():
+    data = json.dumps(DOCUMENT).encode('utf-16')
+    assert decoders.getDecoder('json').decode(data) == DOCUMENT
+
+
+def test_unknown_decoder():
+    with pytest.raises(ValueError):
+        decoders.getDecoder('no-such-decoder')
+
+
+@pytest.mark.parametrize('name', _available())
+def test_mmap_read(tmp_path, name):
+    fname = tmp_path / 'big.json'
+    fname.write_text(json.dumps(DOCUMENT))
+    source = pyJsJson.dataSource.FileSource(
+        [str(tmp_path)], follow_symlinks=True,
+        decoder=decoders.getDecoder(name), mmap_threshold=1,
+    )
+    assert source.loadJsonFile('big.json') == DOCUMENT
+
+
+@pytest.mark.parametrize('name', _available())
+def test_decode_list_root(name):
+    out = decoders.getDecoder(name).decode(b'[[1, [2]], {"a": [[]]}]')
+    assert out == [[1, [2]], {'a': [[]]}]
+    assert isinstance(out, frozen.FrozenList)
+    assert isinstance(out[0][1], frozen.FrozenList)
+    assert isinstance(out[1]['a'][0], frozen.FrozenList)
+
+
+def test_preferred_decoder():
+    expected = 'orjson' if decoders.OrjsonDecoder.isAvailable() else 'json'
+    assert decoders.getDecoder().name == expected
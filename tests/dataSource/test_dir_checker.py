@@ -0,0 +1,59 @@
+"""Test resolution of the file paths within the allowed roots."""
+import os
+
+import pytest
+
+from pyJsJson import exceptions
+from pyJsJson.dataSource import DirChecker
+
+
+@pytest.fixture
+def roots(tmp_path):
+    out = []
+    for name in ('first', 'second', 'outside'):
+        (tmp_path / name).mkdir()
+        out.append(tmp_path / name)
+    (out[1] / 'file.json').write_text('{}')
+    (out[2] / 'secret.json').write_text('{}')
+    return out
+
+
+def test_resolution_cached(roots, mocker):
+    checker = DirChecker([str(roots[0]), str(roots[1])], follow_symlinks=True)
+    isfile = mocker.patch('os.path.isfile', wraps=os.path.isfile)
+    assert checker.findFile('file.json') == str(roots[1] / 'file.json')
+    assert isfile.call_count == 2
+    assert checker.findFile('file.json') == str(roots[1] / 'file.json')
+    assert isfile.call_count == 2
+
+
+def test_negative_resolution_cached(roots):
+    checker = DirChecker([str(roots[0]), str(roots[1])], follow_symlinks=True)
+    with pytest.raises(exceptions.FsError):
+        checker.findFile('new.json')
+    (roots[0] / 'new.json').write_text('{}')
+    checker.newGeneration()
+    assert checker.findFile('new.json') == str(roots[0] / 'new.json')
+    os.unlink(roots[0] / 'new.json')
+    checker.newGeneration()
+    with pytest.raises(exceptions.FsError):
+        checker.findFile('new.json')
+
+
+def test_escape_rejected(roots):
+    checker = DirChecker([str(roots[0])], follow_symlinks=True)
+    with pytest.raises(exceptions.FsError):
+        checker.findFile('../outside/secret.json')
+
+
+@pytest.mark.parametrize('follow_symlinks', [True, False])
+def test_symlinks(roots, follow_symlinks):
+    os.symlink(roots[2] / 'secret.json', roots[0] / 'link.json')
+    os.symlink(roots[2], roots[0] / 'linked-dir')
+    checker = DirChecker([str(roots[0])], follow_symlinks=follow_symlinks)
+    for path in ('link.json', 'linked-dir/secret.json'):
+        if follow_symlinks:
+            assert checker.findFile(path) == os.path.join(str(roots[0]), path)
+        else:
+            with pytest.raises(exceptions.FsError):
+                checker.findFile(path)
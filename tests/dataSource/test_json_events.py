@@ -0,0 +1,98 @@
+"""Test the incremental (event-based) JSON reader."""
+import io
+import json
+
+import pytest
+
+import pyJsJson
+from pyJsJson.dataSource import decodeJsonEvents, iterJsonEvents
+from pyJsJson.util import frozen
+
+DOCUMENT = {
+    'a': [1, 2.5, -3e10, {'b': None, 'c': [True, False, [], {}]}],
+    'text': 'snow ☃ "quoted" \\ \n',
+    'big': 10 ** 40,
+    'empty': '',
+    'nested': [[[[1]]]] * 10,
+}
+
+
+def test_events():
+    assert list(iterJsonEvents(io.BytesIO(b'{"a": [1, {"b": null}], "c": "d"}'))) == [
+        ('start_map', None),
+        ('map_key', 'a'),
+        ('start_array', None),
+        ('value', 1),
+        ('start_map', None),
+        ('map_key', 'b'),
+        ('value', None),
+        ('end_map', None),
+        ('end_array', None),
+        ('map_key', 'c'),
+        ('value', 'd'),
+        ('end_map', None),
+    ]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+@pytest.mark.parametrize('encoding', ['utf-8', 'utf-16'])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_matches_json_loads(chunk_size, encoding, indent):
+    data = json.dumps(DOCUMENT, indent=indent, ensure_ascii=False).encode(encoding)
+    graph = pyJsJson.dependency_graph.constructFromEvents(
+        iterJsonEvents(io.BytesIO(data), chunk_size=chunk_size), name='root',
+    )
+    assert graph.getPlainObject() == json.loads(data)
+
+
+def test_non_strict_values():
+    events = list(iterJsonEvents(io.BytesIO(b'[NaN, Infinity, -Infinity, -0]'), chunk_size=2))
+    values = [value for (event, value) in events if event == 'value']
+    assert [repr(el) for el in values] == ['nan', 'inf', '-inf', '0']
+
+
+@pytest.mark.parametrize('data', [b'', b'[1,]', b'{"a" 1}', b'[1 2]', b'{"a": 1} x', b'"abc', b'[tru]', b'[01]'])
+def test_invalid_documents(data):
+    with pytest.raises(ValueError):
+        list(iterJsonEvents(io.BytesIO(data), chunk_size=2))
+
+
+def test_streamed_file(UnittestFs, UnittestDefaultJsonExpand):
+    UnittestDefaultJsonExpand.fileSource.streamThreshold = 0  # Stream all of the files
+    UnittestFs.mockFile('/unittest/target.json', {'hello': ['world']})
+    root = {'a': {'$ref': 'file:target.json#hello'}, 'b': {'c': 1}}
+    UnittestFs.mockFile('/unittest/root.json', root)
+    stats = pyJsJson.stats.ExpansionStats()
+    out = UnittestDefaultJsonExpand.expandFile('/unittest/root.json', stats=stats)
+    assert out == {'a': ['world'], 'b': {'c': 1}}
+    assert stats.filesLoaded == 2
+    assert stats.bytesParsed == len(json.dumps({'hello': ['world']})) + len(json.dumps(root))
+    # Streamed files are not cached
+    assert len(UnittestDefaultJsonExpand.fileSource.cache) == 0
+
+
+@pytest.mark.parametrize('chunk_size', [2, 64 * 1024])
+def test_decode_events(chunk_size):
+    data = json.dumps(DOCUMENT).encode('utf8')
+    out = decodeJsonEvents(iterJsonEvents(io.BytesIO(data), chunk_size=chunk_size))
+    assert out == json.loads(data)
+    assert isinstance(out, frozen.FrozenDict)
+    assert isinstance(out['a'][3]['c'], frozen.FrozenList)
+
+
+def test_big_files_decoded(UnittestFs, UnittestDefaultJsonExpand, mocker):
+    """Files are not streamed by default: they are decoded (and cached) like any other file."""
+    UnittestFs.mockFile('/unittest/big.json', {'value': 'x' * 1024})
+    stream = mocker.spy(UnittestDefaultJsonExpand.fileSource, 'iterJsonEvents')
+    assert UnittestDefaultJsonExpand.expandFile('/unittest/big.json') == {'value': 'x' * 1024}
+    assert stream.call_count == 0
+    assert len(UnittestDefaultJsonExpand.fileSource.cache) == 1
+
+
+def test_stream_on_memory_error(UnittestFs, UnittestDefaultJsonExpand, mocker):
+    UnittestFs.mockFile('/unittest/target.json', {'hello': ['world']})
+    mocker.patch.object(UnittestDefaultJsonExpand.fileSource, '_parse', side_effect=MemoryError)
+    stats = pyJsJson.stats.ExpansionStats()
+    out = UnittestDefaultJsonExpand.expandFile('/unittest/target.json', stats=stats)
+    assert out == {'hello': ['world']}
+    assert stats.filesLoaded == 1
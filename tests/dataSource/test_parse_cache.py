@@ -0,0 +1,62 @@
+"""Test caching of the parsed files."""
+import pytest
+
+import pyJsJson
+
+
+def test_shared_file_parsed_once(UnittestFs, UnittestDefaultJsonExpand):
+    UnittestFs.mockFile('/unittest/target.json', {'hello': 'world'})
+    for _ in range(2):
+        tree = UnittestDefaultJsonExpand.loadData({
+            'a': {'$ref': 'file:target.json'},
+            'b': {'$ref': 'file:target.json#hello'},
+        })
+        out = UnittestDefaultJsonExpand.expand(tree)
+        assert out == {'a': {'hello': 'world'}, 'b': 'world'}
+    cache = UnittestDefaultJsonExpand.fileSource.cache
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_changed_file_reloaded(UnittestFs):
+    source = pyJsJson.dataSource.FileSource(['/unittest'], follow_symlinks=True)
+    UnittestFs.mockFile('/unittest/target.json', {'v': 1})
+    assert source.loadJsonFile('target.json') == {'v': 1}
+    assert source.loadJsonFile('target.json') == {'v': 1}
+    UnittestFs.mockFile('/unittest/target.json', {'v': 2})
+    assert source.loadJsonFile('target.json') == {'v': 2}
+    assert (source.cache.hits, source.cache.misses) == (1, 2)
+    assert len(source.cache) == 1
+
+
+def test_lru_eviction():
+    cache = pyJsJson.dataSource.ParseCache(max_bytes=10)
+    cache.put('a', 'key-a', 4, 'A')
+    cache.put('b', 'key-b', 4, 'B')
+    assert cache.get('a', 'key-a') == 'A'  # 'b' is now least recently used
+    cache.put('c', 'key-c', 4, 'C')
+    assert cache.evictions == 1
+    assert cache.totalBytes == 8
+    assert cache.get('a', 'key-a') == 'A'
+    assert cache.get('c', 'key-c') == 'C'
+    try:
+        cache.get('b', 'key-b')
+    except KeyError:
+        pass
+    else:
+        raise AssertionError('b must have been evicted')
+
+
+def test_too_big_not_cached():
+    cache = pyJsJson.dataSource.ParseCache(max_bytes=10)
+    cache.put('a', 'key-a', 11, 'A')
+    assert len(cache) == 0
+
+
+def test_loaded_data_is_shared_and_read_only(UnittestFs):
+    source = pyJsJson.dataSource.FileSource(['/unittest'], follow_symlinks=True)
+    UnittestFs.mockFile('/unittest/target.json', {'v': [1, 2]})
+    first = source.loadJsonFile('target.json')
+    assert source.loadJsonFile('target.json') is first
+    assert first == {'v': [1, 2]}
+    with pytest.raises(TypeError):
+        first['v'].append(3)
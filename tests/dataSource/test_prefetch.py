@@ -0,0 +1,80 @@
+"""Test background prefetching of the referenced files."""
+import pytest
+
+import pyJsJson
+
+
+def test_construct_collects_references():
+    references = []
+    pyJsJson.dependency_graph.construct(
+        {
+            'a': {'$ref': 'file:a.json'},
+            'b': [{'$ref': 'file:sub/b.json#key'}],
+            'computed': {'$ref': {'$ref': 'file:c.json'}},
+            'not-a-file': {'$ref': '#anchor'},
+        },
+        name='root',
+        extra_constructors=pyJsJson.commands.DEFAULT_COMMANDS,
+        references=references,
+    )
+    assert sorted(references) == ['a.json', 'c.json', 'sub/b.json']
+
+
+def test_prefetched_file_used(UnittestFs, mocker):
+    source = pyJsJson.dataSource.FileSource(['/unittest'], follow_symlinks=True)
+    UnittestFs.mockFile('/unittest/target.json', {'v': 1})
+    source.prefetch(['target.json'])
+    source._prefetched['target.json'].result()  # Wait for the background load
+    parse = mocker.spy(source, '_parse')
+    assert source.loadJsonFile('target.json') == {'v': 1}
+    assert parse.call_count == 0
+    assert source.bytesParsed == len(b'{"v": 1}')
+    assert (source.cache.hits, source.cache.misses) == (0, 1)
+
+
+def test_stale_prefetch_ignored(UnittestFs):
+    source = pyJsJson.dataSource.FileSource(['/unittest'], follow_symlinks=True)
+    UnittestFs.mockFile('/unittest/target.json', {'v': 1})
+    source.prefetch(['target.json', 'missing.json'])
+    source._prefetched['target.json'].result()
+    assert source._prefetched['missing.json'].result() is None
+    UnittestFs.mockFile('/unittest/target.json', {'v': 2})
+    assert source.loadJsonFile('target.json') == {'v': 2}
+
+
+def test_expansion_prefetches(UnittestFs, UnittestDefaultJsonExpand, mocker):
+    UnittestFs.mockFile('/unittest/target.json', {'hello': 'world'})
+    prefetch = mocker.spy(UnittestDefaultJsonExpand.fileSource, 'prefetch')
+    tree = UnittestDefaultJsonExpand.loadData({'a': {'$ref': 'file:target.json'}})
+    assert tree.staticReferences == ('target.json', )
+    assert prefetch.call_count == 0  # Only once the tree is expanded
+    assert UnittestDefaultJsonExpand.expand(tree) == {'a': {'hello': 'world'}}
+    assert [call.args[0] for call in prefetch.call_args_list] == [('target.json', )]
+
+
+def test_new_generation_drops_prefetches(UnittestFs):
+    source = pyJsJson.dataSource.FileSource(['/unittest'], follow_symlinks=True)
+    UnittestFs.mockFile('/unittest/target.json', {'v': 1})
+    source.prefetch(['target.json', 'missing.json'])
+    futures = list(source._prefetched.values())
+    source.newGeneration()
+    assert source._prefetched == {}
+    assert all(future.cancelled() or future.done() for future in futures)
+    source.close()
+
+
+def test_close(UnittestFs):
+    source = pyJsJson.dataSource.FileSource(['/unittest'], follow_symlinks=True)
+    UnittestFs.mockFile('/unittest/target.json', {'v': 1})
+    source.prefetch(['target.json'])
+    pool = source._prefetchPool
+    source.close()
+    assert source._prefetchPool is None
+    assert source._prefetched == {}
+    with pytest.raises(RuntimeError):
+        pool.submit(print)
+    # Still usable, the prefetching starts a new pool
+    source.prefetch(['target.json'])
+    assert source._prefetched['target.json'].result()[2] == {'v': 1}
+    assert source.loadJsonFile('target.json') == {'v': 1}
+    source.close()
@@ -0,0 +1,38 @@
+import pyJsJson
+from pyJsJson.util import URI
+
+
+def _rootNs():
+    return pyJsJson.namespace.RootNamespace(
+        name='root',
+        var={'uri': URI.fromString('scheme:path')},
+    )
+
+
+def _construct(data):
+    return pyJsJson.dependency_graph.construct(
+        data, name='graph', extra_constructors=pyJsJson.commands.DEFAULT_COMMANDS,
+    )
+
+
+def test_child_namespaces_reused():
+    ns = _rootNs()
+    graph = _construct({'a': {'b': [1, {'$ref': 'file:x.json'}]}})
+    first = graph._getChildNamespaces(ns)
+    assert graph._getChildNamespaces(ns) is first
+    # But not when expanded within another namespace
+    assert graph._getChildNamespaces(_rootNs()) is not first
+
+
+def test_child_uris():
+    ns = _rootNs()
+    graph = _construct({'a': {'b': [1, [{'$ref': 'file:x.json'}], [2]]}})
+    (a_ns, ) = graph._getChildNamespaces(ns)
+    (b_ns, ) = graph.data['a']._getChildNamespaces(a_ns)
+    (primitive_ns, el_ns, literal_ns) = graph.data['a'].data['b']._getChildNamespaces(b_ns)
+    # Primitives and literals do not need namespaces
+    assert primitive_ns is None
+    assert literal_ns is None
+    assert el_ns.name == 'root.a.b.[1]'
+    assert el_ns.var.uri.toString() == 'scheme:path#a/b/1'
+    assert a_ns.var.uri.toString() == 'scheme:path#a'
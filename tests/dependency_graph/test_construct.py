@@ -0,0 +1,113 @@
+import sys
+
+import pytest
+
+import pyJsJson
+from pyJsJson.dependency_graph import base, construct, indexConstructors
+
+
+def test_structure():
+    graph = construct(
+        {'a': [1, 'two', None, {'$ref': 'file:x.json'}], 'b': {'$ref': 'file:x.json', 'other': 1}},
+        name='root',
+        extra_constructors=pyJsJson.commands.DEFAULT_COMMANDS,
+    )
+    assert isinstance(graph, base.Mapping)
+    arr = graph.data['a']
+    assert isinstance(arr, base.Tuple)
+    assert [type(el) for el in arr.data] == [
+        base.Primitive, base.Primitive, base.Primitive, pyJsJson.commands.Ref
+    ]
+    # Not a single-key mapping -> not a command (and there are no commands in it)
+    assert type(graph.data['b']) is base.Literal
+    assert str(arr.data[3].name) == 'root.a[3]'
+    # Primitives are anonymous, the common ones are shared
+    assert arr.data[3].data['$ref'].name is None
+    assert arr.data[0] is base.Primitive.shared(1)
+
+
+def test_literal_subtrees():
+    static = {'list': [1, {'x': 'y'}], 'dict': {'$ref': 'file:x.json', 'other': 1}}
+    graph = construct(
+        {'static': static, 'ref': [static['list'], {'$ref': 'file:x.json'}]},
+        name='root',
+        extra_constructors=pyJsJson.commands.DEFAULT_COMMANDS,
+    )
+    # Only the commands and their ancestors are walked into
+    assert type(graph.data['static']) is base.Literal
+    assert graph.data['static'].data is static
+    # The plain object is a mutable copy
+    plain = graph.data['static'].getPlainObject()
+    assert plain == static
+    assert plain is not static and plain['list'] is not static['list']
+    assert [type(el) for el in graph.data['ref'].data] == [base.Literal, pyJsJson.commands.Ref]
+    assert type(construct(static, name='root')) is base.Literal
+
+
+@pytest.mark.parametrize('data', [1, 'str', None, 1.5, True])
+def test_primitive_root(data):
+    graph = construct(data, name='root')
+    assert isinstance(graph, base.Primitive)
+    assert graph.getPlainObject() == data
+
+
+def test_deep_nesting():
+    depth = sys.getrecursionlimit() * 10
+    data = leaf = []
+    for _ in range(depth):
+        new_leaf = {'key': []}
+        leaf.append(new_leaf)
+        leaf = new_leaf['key']
+    leaf.append({'$ref': 'file:x.json'})
+    graph = construct(data, name='root', extra_constructors=pyJsJson.commands.DEFAULT_COMMANDS)
+    for _ in range(depth):
+        graph = graph.data[0].data['key']
+    assert isinstance(graph.data[0], pyJsJson.commands.Ref)
+
+
+def test_unsupported_type():
+    with pytest.raises(NotImplementedError):
+        construct({'a': object()}, name='root')
+
+
+def test_compact_nodes():
+    graph = construct(
+        {'a': [1, 'text'], 'b': {'$ref': 'file:x.json'}},
+        name='root',
+        extra_constructors=pyJsJson.commands.DEFAULT_COMMANDS,
+    )
+    nodes = [graph, graph.data['a'], graph.data['a'].data[1], graph.data['b']]
+    assert not any(hasattr(node, '__dict__') for node in nodes)
+
+
+class _OtherRef(pyJsJson.commands.base.Base):
+    __slots__ = ()
+    key = '$ref'
+
+
+def test_command_index():
+    index = indexConstructors(pyJsJson.commands.DEFAULT_COMMANDS)
+    assert index == {'$ref': pyJsJson.commands.Ref}
+    assert indexConstructors([pyJsJson.commands.Ref], index=index) == index  # Loading the same command is fine
+    with pytest.raises(pyJsJson.exceptions.CommandCollisionError):
+        indexConstructors([_OtherRef], index=index)
+    assert index == {'$ref': pyJsJson.commands.Ref}
+
+
+def test_dispatch_by_key(mocker):
+    match = mocker.spy(pyJsJson.commands.Ref, 'match')
+    graph = construct(
+        {'a': {'$ref': 'file:x.json'}, 'b': {'$other': 1}, 'c': [[1]]},
+        name='root',
+        extra_constructors=indexConstructors(pyJsJson.commands.DEFAULT_COMMANDS),
+    )
+    assert isinstance(graph.data['a'], pyJsJson.commands.Ref)
+    assert type(graph.data['b']) is base.Literal
+    assert match.call_count == 0
+
+
+def test_load_commands_collision(UnittestDefaultJsonExpand):
+    with pytest.raises(pyJsJson.exceptions.CommandCollisionError):
+        UnittestDefaultJsonExpand.loadCommands([_OtherRef])
+    assert UnittestDefaultJsonExpand.commandIndex == {'$ref': pyJsJson.commands.Ref}
+    assert UnittestDefaultJsonExpand.commandConstructors == pyJsJson.commands.DEFAULT_COMMANDS
@@ -0,0 +1,34 @@
+"""Test that the expanded subgraphs are not expanded again."""
+import pyJsJson
+from pyJsJson.dependency_graph import base
+from pyJsJson.dependency_graph.base import ExpansionRvCode
+
+
+def test_finished_subtrees_not_revisited(UnittestFs, UnittestDefaultJsonExpand):
+    UnittestFs.mockFile('/unittest/target.json', {'hello': 'world'})
+    stats = pyJsJson.stats.ExpansionStats()
+    tree = UnittestDefaultJsonExpand.loadData({
+        'static': {'list': [1, 2, 3], 'dict': {'x': 'y'}},
+        'ref': [{'$ref': 'file:target.json'}],
+    })
+    out = UnittestDefaultJsonExpand.expand(tree, stats=stats)
+    assert out == {
+        'static': {'list': [1, 2, 3], 'dict': {'x': 'y'}},
+        'ref': [{'hello': 'world'}],
+    }
+    # The first pass visits the whole tree (the static part is a single literal node),
+    #   the last one only the path to the (previously blocked) reference
+    assert stats.nodesVisitedPerPass[0] == 5
+    assert stats.nodesVisitedPerPass[-1] == 3
+
+
+def test_success_memoized():
+    ns = pyJsJson.namespace.RootNamespace(name='root')
+    graph = base.Mapping('graph', {
+        'a': base.Tuple('graph.a', (base.Primitive.shared(1), base.Literal(None, {'b': 2}))),
+    })
+    first = graph.doExpand(ns)
+    assert first.state == ExpansionRvCode.SUCCESS
+    assert graph.doExpand(ns) is first
+    assert first.result.getPlainObject() == {'a': [1, {'b': 2}]}
+    assert isinstance(first.result.data['a'].data, tuple)
@@ -0,0 +1,52 @@
+import pytest
+
+from pyJsJson.dependency_graph import base, construct, PointerIndex
+from pyJsJson.dependency_graph.pointer import parsePointer
+
+
+@pytest.mark.parametrize('pointer, tokens', [
+    ('', ()),
+    ('/', ('', )),
+    ('a', ('a', )),
+    ('/a/b', ('a', 'b')),
+    ('a/b', ('a', 'b')),
+    ('/a~1b/c~0d/~01', ('a/b', 'c~d', '~1')),
+    ('/a%25b', ('a%25b', )),
+])
+def test_parse(pointer, tokens):
+    assert parsePointer(pointer) == tokens
+
+
+@pytest.mark.parametrize('pointer, tokens', [
+    ('/a%25b', ('a%b', )),
+    ('/a%2Fb/c~1d', ('a', 'b', 'c/d')),  # Percent-decoded before the tokens are split (RFC 6901, section 6)
+])
+def test_parse_fragment(pointer, tokens):
+    assert parsePointer(pointer, fragment=True) == tokens
+
+
+def test_lazy_index():
+    graph = construct({'a': {'b': [1, {'c': 2}]}, 'other': {'x': 1}}, name='root')
+    index = PointerIndex(graph)
+    node = index.resolve('/a/b/1/c')
+    assert node.data == 2
+    assert index.resolve('a/b/1/c') is node
+    assert index.lookup(('a', 'b', '1', 'c')) is node
+    # Only the requested path is indexed
+    assert set(index._byPath) == {(), ('a', ), ('a', 'b'), ('a', 'b', '1'), ('a', 'b', '1', 'c')}
+    with pytest.raises(KeyError):
+        index.resolve('/other/y')
+    with pytest.raises(IndexError):
+        index.resolve('/a/b/2')
+
+
+def test_literal_children():
+    data = {'a': {'b': [1, {'c': 'text'}]}}
+    index = PointerIndex(construct(data, name='root'))
+    node = index.resolve('/a/b/1')
+    assert type(node) is base.Literal
+    assert node.data is data['a']['b'][1]
+    assert type(index.resolve('/a/b/1/c')) is base.Primitive
+    assert index.resolve('/a/b/0') is base.Primitive.shared(1)
+    with pytest.raises(KeyError):
+        index.resolve('/a/b/01')
@@ -0,0 +1,36 @@
+"""Test batch expansion."""
+
+
+def test_shared_files_expanded_once(UnittestFs, UnittestDefaultJsonExpand, mocker):
+    UnittestFs.mockFile('/unittest/shared.json', {'value': {'$ref': 'file:leaf.json'}})
+    UnittestFs.mockFile('/unittest/leaf.json', {'hello': 'world'})
+    for idx in range(5):
+        UnittestFs.mockFile(f'/unittest/root-{idx}.json', {'idx': idx, 'ref': {'$ref': 'file:shared.json#value'}})
+    load_spy = mocker.spy(UnittestDefaultJsonExpand, 'loadJsonFile')
+    construct_spy = mocker.spy(UnittestDefaultJsonExpand, '_toTree')
+
+    paths = [f'/unittest/root-{idx}.json' for idx in range(5)]
+    data_tree = UnittestDefaultJsonExpand.loadData({'$ref': 'file:shared.json'})
+    out = list(UnittestDefaultJsonExpand.expandMany(paths + [data_tree]))
+
+    assert len(out) == 6
+    results = dict(
+        (tree.uri.path, result)
+        for (tree, result) in out
+    )
+    assert results['<data-0>'] == {'value': {'hello': 'world'}}
+    for idx in range(5):
+        assert results[f'/unittest/root-{idx}.json'] == {'idx': idx, 'ref': {'hello': 'world'}}
+    loaded = sorted(call.args[0] for call in load_spy.call_args_list)
+    # The data tree resolves its references relative to the search roots, so it does not share the file trees
+    assert loaded == sorted(['/unittest/leaf.json', '/unittest/shared.json', 'leaf.json', 'shared.json'] + paths)
+    assert construct_spy.call_count == len(loaded) + 1
+
+
+def test_results_in_order_of_completion(UnittestFs, UnittestDefaultJsonExpand):
+    UnittestFs.mockFile('/unittest/leaf.json', {'hello': 'world'})
+    slow = UnittestDefaultJsonExpand.loadData({'$ref': 'file:leaf.json'})
+    fast = UnittestDefaultJsonExpand.loadData({'hello': 'fast'})
+    out = UnittestDefaultJsonExpand.expandMany([slow, fast])
+    assert next(out) == (fast, {'hello': 'fast'})
+    assert next(out) == (slow, {'hello': 'world'})
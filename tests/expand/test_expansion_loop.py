@@ -0,0 +1,90 @@
+"""Test the expansion loop scheduling."""
+import collections
+import sys
+
+import pytest
+
+import pyJsJson
+
+
+def test_blocked_trees_are_woken_up_once(UnittestFs, UnittestDefaultJsonExpand, mocker):
+    UnittestFs.mockFile('/unittest/base.json', {'$ref': 'file:mid.json'})
+    UnittestFs.mockFile('/unittest/mid.json', {'$ref': 'file:leaf.json'})
+    UnittestFs.mockFile('/unittest/leaf.json', {'hello': 'world'})
+    spy = mocker.spy(pyJsJson.trees.ExpansionTrees, 'expand')
+
+    tree = UnittestDefaultJsonExpand.loadData({'a': {'$ref': 'file:base.json'}, 'b': 'c'})
+    out = UnittestDefaultJsonExpand.expand(tree)
+
+    assert out['a'] == {'hello': 'world'}
+    expand_counts = collections.Counter(
+        call.args[1].rsplit('::', 1)[-1]
+        for call in spy.call_args_list
+    )
+    assert expand_counts == {
+        '[expand.tree.uri:<data-0>]': 2,
+        # Relative references of the files are resolved relative to the (data) input
+        '[expand.tree.uri:/unittest/base.json (relative to the search roots)]': 2,
+        '[expand.tree.uri:/unittest/mid.json (relative to the search roots)]': 2,
+        '[expand.tree.uri:/unittest/leaf.json (relative to the search roots)]': 1,
+    }
+
+
+def test_empty_containers(UnittestDefaultJsonExpand):
+    tree = UnittestDefaultJsonExpand.loadData({'a': {}})
+    assert UnittestDefaultJsonExpand.expand(tree) == {'a': {}}
+
+
+def test_shared_file_loaded_once(UnittestFs, UnittestDefaultJsonExpand, mocker):
+    UnittestFs.mockFile('/unittest/shared.json', {'$ref': 'file:leaf.json'})
+    UnittestFs.mockFile('/unittest/leaf.json', {'hello': 'world'})
+    spy = mocker.spy(UnittestDefaultJsonExpand, 'loadJsonFile')
+
+    tree = UnittestDefaultJsonExpand.loadData(dict(
+        (f"key-{idx}", {'$ref': 'file:shared.json#hello'})
+        for idx in range(10)
+    ))
+    out = UnittestDefaultJsonExpand.expand(tree)
+    assert set(out.values()) == {'world'}
+    assert sorted(call.args[0] for call in spy.call_args_list) == ['leaf.json', 'shared.json']
+
+
+def test_reference_cycle(UnittestFs, UnittestDefaultJsonExpand):
+    UnittestFs.mockFile('/unittest/a.json', {'b': {'$ref': 'file:b.json'}})
+    UnittestFs.mockFile('/unittest/b.json', {'c': {'$ref': 'file:c.json'}})
+    UnittestFs.mockFile('/unittest/c.json', [{'$ref': 'file:a.json'}])
+
+    tree = UnittestDefaultJsonExpand.loadJsonFile('/unittest/a.json')
+    with pytest.raises(pyJsJson.exceptions.ReferenceCycleError) as err:
+        UnittestDefaultJsonExpand.expand(tree)
+    assert err.value.cycle == (
+        'expand.tree.uri:/unittest/c.json',
+        'expand.tree.uri:/unittest/a.json',
+        'expand.tree.uri:/unittest/b.json',
+        'expand.tree.uri:/unittest/c.json',
+    )
+
+
+def test_self_reference_cycle(UnittestFs, UnittestDefaultJsonExpand):
+    UnittestFs.mockFile('/unittest/a.json', {'a': 1, 'b': {'$ref': 'file:a.json#a'}})
+    tree = UnittestDefaultJsonExpand.loadJsonFile('/unittest/a.json')
+    with pytest.raises(pyJsJson.exceptions.ReferenceCycleError) as err:
+        UnittestDefaultJsonExpand.expand(tree)
+    assert len(err.value.cycle) == 2
+
+
+def test_deep_document(tmp_path):
+    depth = sys.getrecursionlimit() * 10
+    (tmp_path / 'target.json').write_text('{"value": "hello"}')
+    (tmp_path / 'root.json').write_text(
+        '{"sib": [1, {"a": 2}], "child": ' * depth + '{"$ref": "file:target.json#value"}' + '}' * depth
+    )
+    expander = pyJsJson.expand.JsonExpand(allowed_search_roots=[str(tmp_path)])
+    expander.loadCommands(pyJsJson.commands.DEFAULT_COMMANDS)
+
+    out = expander.expandFile(str(tmp_path / 'root.json'))
+
+    for _ in range(depth):
+        assert out['sib'] == [1, {'a': 2}]
+        out = out['child']
+    assert out == 'hello'
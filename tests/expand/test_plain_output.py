@@ -0,0 +1,38 @@
+"""Test that the expansion results are plain (mutable) data that is not shared with the inputs."""
+import copy
+
+import pyJsJson
+
+
+def test_file_output_mutable(UnittestFs, UnittestDefaultJsonExpand):
+    UnittestFs.mockFile('/unittest/target.json', {'tbl': {'x': 0}, 'list': [[1]]})
+    UnittestFs.mockFile('/unittest/root.json', {'ref': {'$ref': 'file:target.json'}, 'tbl': {'y': [1]}})
+    out = UnittestDefaultJsonExpand.expandFile('/unittest/root.json')
+    out['tbl']['x'] = 1
+    out['tbl']['y'].append(2)
+    out['ref']['tbl']['x'] = 1
+    out['ref']['list'][0].append(2)
+    # The parsed (and cached) files are not changed
+    again = UnittestDefaultJsonExpand.expandFile('/unittest/root.json')
+    assert again == {'ref': {'tbl': {'x': 0}, 'list': [[1]]}, 'tbl': {'y': [1]}}
+    assert type(again['tbl']) is dict
+    assert type(again['ref']['list'][0]) is list
+
+
+def test_data_output_not_aliased(UnittestFs, UnittestDefaultJsonExpand):
+    UnittestFs.mockFile('/unittest/target.json', {'hello': 'world'})
+    data = {'t': {'a': [1, {'b': 2}]}, 'ref': {'$ref': 'file:target.json'}}
+    orig = copy.deepcopy(data)
+    out = UnittestDefaultJsonExpand.expand(UnittestDefaultJsonExpand.loadData(data))
+    assert out['t'] is not data['t']
+    out['t']['a'][1]['b'] = 3
+    out['t']['new'] = 1
+    assert data == orig
+
+
+def test_literal_root_not_aliased(UnittestDefaultJsonExpand):
+    data = {'a': [1, 2]}
+    out = UnittestDefaultJsonExpand.expand(UnittestDefaultJsonExpand.loadData(data))
+    out['a'].append(3)
+    assert data == {'a': [1, 2]}
+    assert isinstance(out, dict) and not isinstance(out, pyJsJson.util.frozen.FrozenDict)
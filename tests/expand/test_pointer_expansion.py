@@ -0,0 +1,59 @@
+"""Test expansion of the part of a tree a JSON pointer points to."""
+import pytest
+
+import pyJsJson
+
+
+@pytest.fixture
+def tree(UnittestFs, UnittestDefaultJsonExpand):
+    UnittestFs.mockFile('/unittest/api.json', {'port': 80, 'hosts': ['a', 'b']})
+    UnittestFs.mockFile('/unittest/db.json', {'port': 5432})
+    UnittestFs.mockFile('/unittest/root.json', {
+        'services': {
+            'api': {'$ref': 'file:api.json'},
+            'db': {'$ref': 'file:db.json'},
+            'static': [{'name': 'x', 'config': {'$ref': 'file:api.json#port'}}],
+        },
+        'broken': {'$ref': 'file:missing.json'},
+    })
+    return UnittestDefaultJsonExpand.loadJsonFile('/unittest/root.json')
+
+
+@pytest.mark.parametrize('pointer, expected, loaded', [
+    ('/services/db', {'port': 5432}, ['db.json']),
+    ('/services/api/hosts/1', 'b', ['api.json']),  # Continues within the expanded reference
+    ('/services/static/0', {'name': 'x', 'config': 80}, ['api.json']),
+    ('services/static/0/name', 'x', []),
+])
+def test_pointer(UnittestDefaultJsonExpand, tree, mocker, pointer, expected, loaded):
+    spy = mocker.spy(UnittestDefaultJsonExpand, 'loadJsonFile')
+    prefetch = mocker.spy(UnittestDefaultJsonExpand.fileSource, 'prefetch')
+    parse = mocker.spy(UnittestDefaultJsonExpand.fileSource, '_parse')
+    assert UnittestDefaultJsonExpand.expand(tree, pointer=pointer) == expected
+    # Only the files the selected part references are loaded (or even prefetched)
+    assert sorted(call.args[0].rsplit('/', 1)[-1] for call in spy.call_args_list) == loaded
+    prefetched = set(path for call in prefetch.call_args_list for path in call.args[0])
+    assert sorted(set(path.rsplit('/', 1)[-1] for path in prefetched)) == loaded
+    assert sorted(set(call.args[0].rsplit('/', 1)[-1] for call in parse.call_args_list)) == loaded
+
+
+@pytest.mark.parametrize('pointer', ['/nope', '/services/static/1', '/services/api/nope'])
+def test_invalid_pointer(UnittestDefaultJsonExpand, tree, pointer):
+    with pytest.raises(pyJsJson.exceptions.InvalidPointerError):
+        UnittestDefaultJsonExpand.expand(tree, pointer=pointer)
+
+
+def test_escaped_pointer(UnittestFs, UnittestDefaultJsonExpand):
+    tree = UnittestDefaultJsonExpand.loadData({'a/b': {'c~d': 1}})
+    assert UnittestDefaultJsonExpand.expand(tree, pointer='/a~1b/c~0d') == 1
+
+
+@pytest.mark.parametrize('pointer, expected', [
+    ('/100%25', 'percent'),
+    ('/a%2Fb', 'escaped slash'),
+    ('/a~1b', 'slash'),
+])
+def test_pointer_not_percent_decoded(UnittestDefaultJsonExpand, pointer, expected):
+    """The pointers are plain JSON pointers (not URI fragments)."""
+    tree = UnittestDefaultJsonExpand.loadData({'100%25': 'percent', 'a%2Fb': 'escaped slash', 'a/b': 'slash'})
+    assert UnittestDefaultJsonExpand.expand(tree, pointer=pointer) == expected
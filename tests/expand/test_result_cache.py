@@ -0,0 +1,124 @@
+"""Test the persistent expansion result cache."""
+import json
+import os
+
+import pytest
+
+import pyJsJson
+
+
+@pytest.fixture
+def files(tmp_path):
+    src = tmp_path / 'src'
+    src.mkdir()
+
+    def _write(name, data):
+        (src / name).write_text(json.dumps(data))
+    _write('root.json', {'mid': {'$ref': 'file:mid.json'}})
+    _write('mid.json', {'leaf': {'$ref': 'file:leaf.json#value'}})
+    _write('leaf.json', {'value': 1})
+    _write.dir = str(src)
+    return _write
+
+
+@pytest.fixture
+def new_expander(files, tmp_path):
+    def _new(max_bytes=pyJsJson.result_cache.DEFAULT_MAX_BYTES):
+        expander = pyJsJson.expand.JsonExpand(allowed_search_roots=[files.dir])
+        expander.loadCommands(pyJsJson.commands.DEFAULT_COMMANDS)
+        expander.resultCache = pyJsJson.result_cache.ResultCache(str(tmp_path / 'cache'), max_bytes=max_bytes)
+        return expander
+    return _new
+
+
+def test_hit(files, new_expander, mocker):
+    assert new_expander().expandFile('root.json') == {'mid': {'leaf': 1}}
+    expander = new_expander()
+    spy = mocker.spy(expander, 'loadJsonFile')
+    stats = pyJsJson.stats.ExpansionStats()
+    assert expander.expandFile('root.json', stats=stats) == {'mid': {'leaf': 1}}
+    assert spy.call_count == 0
+    assert (stats.resultCacheHits, stats.resultCacheMisses) == (1, 0)
+
+
+def test_changed_dependency(files, new_expander):
+    new_expander().expandFile('root.json')
+    files('leaf.json', {'value': 2})
+    expander = new_expander()
+    assert expander.expandFile('root.json') == {'mid': {'leaf': 2}}
+    assert (expander.resultCache.hits, expander.resultCache.misses) == (0, 1)
+
+
+def test_touched_dependency(files, new_expander):
+    new_expander().expandFile('root.json')
+    leaf = os.path.join(files.dir, 'leaf.json')
+    os.utime(leaf, ns=(1, 1))  # Same content, different stat
+    expander = new_expander()
+    assert expander.expandFile('root.json') == {'mid': {'leaf': 1}}
+    assert expander.resultCache.hits == 1
+
+
+def test_different_commands(files, new_expander):
+    new_expander().expandFile('root.json')
+    expander = new_expander()
+    expander.loadCommands([pyJsJson.commands.Ref])
+    expander.expandFile('root.json')
+    assert expander.resultCache.misses == 1
+
+
+def test_eviction(files, new_expander):
+    files('other.json', {'value': 'x' * 100})
+    expander = new_expander()
+    cache = expander.resultCache
+    expander.expandFile('root.json')
+    cache.maxBytes = cache.totalBytes() + 100  # Not enough for one more entry
+    expander.expandFile('other.json')
+    assert cache.totalBytes() <= cache.maxBytes
+    expander.expandFile('other.json')
+    assert cache.hits == 1
+    # The least recently used (root.json) entry is gone
+    expander.expandFile('root.json')
+    assert cache.misses == 3
+
+
+def test_put_does_not_scan(files, new_expander, mocker):
+    expander = new_expander()
+    cache = expander.resultCache
+    scan = mocker.spy(cache, '_iterEntries')
+    for idx in range(5):
+        files(f"file-{idx}.json", {'value': idx})
+        expander.expandFile(f"file-{idx}.json")
+    assert scan.call_count == 1  # Only the initial size scan, not a scan per `put`
+    assert cache._totalBytes == cache.totalBytes()
+
+
+def test_key_depends_on_search_settings(files, tmp_path, new_expander):
+    new_expander().expandFile('root.json')
+    for (roots, follow_symlinks) in [([files.dir, str(tmp_path)], True), ([files.dir], False)]:
+        expander = pyJsJson.expand.JsonExpand(allowed_search_roots=roots, follow_symlinks=follow_symlinks)
+        expander.loadCommands(pyJsJson.commands.DEFAULT_COMMANDS)
+        expander.resultCache = pyJsJson.result_cache.ResultCache(str(tmp_path / 'cache'))
+        expander.expandFile(os.path.join(files.dir, 'root.json'))
+        assert (expander.resultCache.hits, expander.resultCache.misses) == (0, 1)
+
+
+def test_shadowed_file(files, tmp_path):
+    """A file added earlier in the search path shadows the one the cached result was expanded from."""
+    first = tmp_path / 'first'
+    first.mkdir()
+    expander = pyJsJson.expand.JsonExpand(allowed_search_roots=[str(first), files.dir])
+    expander.loadCommands(pyJsJson.commands.DEFAULT_COMMANDS)
+    expander.resultCache = pyJsJson.result_cache.ResultCache(str(tmp_path / 'cache'))
+    assert expander.expandFile('root.json') == {'mid': {'leaf': 1}}
+    (first / 'root.json').write_text(json.dumps({'shadowed': True}))
+    assert expander.expandFile('root.json') == {'shadowed': True}
+
+
+def test_missing_path_created(tmp_path):
+    cache = pyJsJson.result_cache.ResultCache(str(tmp_path / 'cache'))
+    (tmp_path / 'used.json').write_text('1')
+    cache.put('key', [str(tmp_path / 'used.json')], 1, missing_paths=[str(tmp_path / 'shadow.json')])
+    assert cache.get('key') == 1
+    (tmp_path / 'shadow.json').write_text('2')
+    with pytest.raises(KeyError):
+        cache.get('key')
@@ -0,0 +1,29 @@
+"""Test expansion statistics."""
+import pyJsJson
+from pyJsJson.dependency_graph.base import ExpansionRvCode
+
+
+def test_stats(UnittestFs, UnittestDefaultJsonExpand):
+    UnittestFs.mockFile('/unittest/target.json', {'hello': 'world'})
+    stats = pyJsJson.stats.ExpansionStats()
+    tree = UnittestDefaultJsonExpand.loadData({
+        'a': {'$ref': 'file:target.json'},
+        'b': 'c',
+    })
+    out = UnittestDefaultJsonExpand.expand(tree, stats=stats)
+    assert out == {'a': {'hello': 'world'}, 'b': 'c'}
+    assert stats.loopPasses == 3
+    # data tree (4 nodes) is blocked, target.json (a single literal node) is expanded,
+    #   only the blocked data nodes are revisited
+    assert stats.nodesVisitedPerPass == [4, 1, 2]
+    assert stats.nodesVisited == 7
+    assert stats.treeResults[ExpansionRvCode.SUCCESS] == 2
+    assert stats.blockedBy == 1
+    assert stats.tryAgain == 0
+    assert stats.filesLoaded == 1
+    assert (stats.cacheHits, stats.cacheMisses) == (0, 1)
+    assert stats.bytesParsed == len(b'{"hello": "world"}')
+    assert stats.graphsConstructed == 1  # loadData() is not accounted for
+    assert stats.phaseTimes['expand'] > 0
+    assert 'loop passes' in stats.format()
+    assert stats.asDict()['tree_results'] == {'SUCCESS': 2, 'TRY_AGAIN': 0, 'BLOCKED_BY': 1}
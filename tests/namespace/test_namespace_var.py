@@ -0,0 +1,39 @@
+import pytest
+
+import pyJsJson
+
+
+@pytest.fixture
+def root_ns():
+    return pyJsJson.namespace.RootNamespace(name='root', var={'a': 1, 'b': 2})
+
+
+def test_chained_lookup(root_ns):
+    child = root_ns.newChild('child', var={'b': 'child-b', 'c': None})
+    grandchild = child.newChild('grandchild', var={'d': 4})
+    assert grandchild.name == 'root.child.grandchild'
+    assert grandchild.var['a'] == 1
+    assert grandchild.var.b == 'child-b'
+    assert grandchild.var['c'] is None
+    assert 'c' in grandchild.var
+    assert 'x' not in grandchild.var
+    with pytest.raises(KeyError):
+        grandchild.var['x']
+    assert dict(grandchild.var) == {'a': 1, 'b': 'child-b', 'c': None, 'd': 4}
+    assert len(grandchild.var) == 4
+    assert root_ns.var.b == 2
+
+
+def test_set_vars_visible_to_children(root_ns):
+    child = root_ns.newChild('child')
+    root_ns.setVars({'late': 'value'})
+    assert child.var.late == 'value'
+    with pytest.raises(pyJsJson.exceptions.PyJsJsonException):
+        root_ns.setVars({'a': 'override'})
+
+
+def test_copy(root_ns):
+    child = root_ns.newChild('child', var={'c': 3})
+    snapshot = child.var.copy()
+    root_ns.setVars({'late': 'value'})
+    assert dict(snapshot) == {'a': 1, 'b': 2, 'c': 3}
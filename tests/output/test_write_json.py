@@ -0,0 +1,56 @@
+import io
+import json
+
+import pytest
+
+import pyJsJson
+from pyJsJson.dependency_graph import construct
+
+
+DATA = {
+    'z': [1, 2.5, -0.0, None, True, False, [], {}, [[]]],
+    'a': {'unicode': 'héllo "quoted"\n', 'nested': {'k': [{'x': 1}]}},
+    'empty': '',
+    'big': 10 ** 30,
+}
+
+
+@pytest.mark.parametrize('indent', [None, 0, 2, 4])
+@pytest.mark.parametrize('sort_keys', [True, False])
+@pytest.mark.parametrize('as_graph', [True, False])
+def test_matches_json_dumps(indent, sort_keys, as_graph):
+    obj = construct(DATA, name='root') if as_graph else DATA
+    fout = io.StringIO()
+    pyJsJson.output.writeJson(obj, fout, indent=indent, sort_keys=sort_keys, buffer_size=16)
+    expected = json.dumps(
+        DATA, indent=indent, sort_keys=sort_keys,
+        separators=(',', ':') if indent is None else (',', ': '),
+    )
+    assert fout.getvalue() == expected
+
+
+@pytest.mark.parametrize('value', [1, 'str', None, 1.5, [], {}])
+def test_scalar_roots(value):
+    fout = io.StringIO()
+    pyJsJson.output.writeJson(construct(value, name='root'), fout, indent=4)
+    assert fout.getvalue() == json.dumps(value, indent=4)
+
+
+def test_special_floats():
+    out = ''.join(pyJsJson.output.iterJsonChunks([float('nan'), float('inf'), -float('inf')]))
+    assert out == json.dumps([float('nan'), float('inf'), -float('inf')], separators=(',', ':'))
+
+
+def test_deep_nesting():
+    depth = 10000
+    data = leaf = []
+    for _ in range(depth):
+        leaf.append([])
+        leaf = leaf[0]
+    out = ''.join(pyJsJson.output.iterJsonChunks(construct(data, name='root')))
+    assert out == '[' * depth + '[]' + ']' * depth
+
+
+def test_unsupported_type():
+    with pytest.raises(TypeError):
+        ''.join(pyJsJson.output.iterJsonChunks({'a': object()}))
@@ -1,7 +1,10 @@
 """Virtual filesystem overlay to mock file access."""
 
+import errno
+import itertools
 import json
 import os
+import stat
 
 import mock_open
 
@@ -10,6 +13,10 @@ ORIG_OS_PATH = {
     'isfile': os.path.isfile,
 }
 
+ORIG_OS = {
+    'stat': os.stat,
+}
+
 orig_builtins_open = open
 
 
@@ -23,10 +30,15 @@ class TestFs:
     def __init__(self, root: str):
         self.root = FakeDir(parent=None, name=root)
         self._mockOpen = mock_open.MockOpen()
+        self._fileStats = {}  # file path -> (inode, mtime_ns, size)
+        self._dirMtimes = {}  # dir path -> mtime_ns (changes whenever a file is added to the dir)
+        self._inodes = itertools.count(1)
+        self._clock = itertools.count(1)  # Fake modification time (seconds)
 
     def activate(self, mocker):
         mocker.patch.object(os.path, 'isdir', side_effect=self._mockedOsPathIsdir)
         mocker.patch.object(os.path, 'isfile', side_effect=self._mockedOsPathIsfile)
+        mocker.patch.object(os, 'stat', side_effect=self._mockedOsStat)
         mocker.patch('builtins.open', self._mockOpen)
 
     def _mockedOsPathIsdir(self, path):
@@ -45,6 +57,22 @@ class TestFs:
             out = ORIG_OS_PATH['isfile'](path)
         return out
 
+    def _mockedOsStat(self, path, *args, **kwargs):
+        if not (isinstance(path, str) and self.root.isParentOf(path)):
+            return ORIG_OS['stat'](path, *args, **kwargs)
+        if path in self._fileStats:
+            (inode, mtime_ns, size) = self._fileStats[path]
+            mode = stat.S_IFREG | 0o644
+        elif self.root.isDir(path):
+            (inode, mtime_ns, size) = (0, self._dirMtimes.get(path, 0), 0)
+            mode = stat.S_IFDIR | 0o755
+        else:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        return os.stat_result(
+            (mode, inode, 0, 1, 0, 0, size, 0, mtime_ns // 10**9, 0),
+            {'st_mtime_ns': mtime_ns},
+        )
+
     def mockFile(self, file_path, file_data):
         if isinstance(file_data, bytes):
             file_bin_payload = file_data
@@ -54,6 +82,13 @@ class TestFs:
 
         file_mock = self._mockOpen[file_path]
         file_mock.read_data = file_bin_payload
+        # Each (re-)mock of the file looks like a new modification of it
+        if file_path in self._fileStats:
+            inode = self._fileStats[file_path][0]
+        else:
+            inode = next(self._inodes)
+            self._dirMtimes[os.path.dirname(file_path)] = next(self._clock) * 10**9
+        self._fileStats[file_path] = (inode, next(self._clock) * 10**9, len(file_bin_payload))
         return self.root.addFile(file_path, file_mock)
 
 
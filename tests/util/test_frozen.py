@@ -0,0 +1,77 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from pyJsJson.util import frozen
+
+
+DATA = {'a': [1, {'b': [[2], []]}], 'c': None, 'd': {}}
+
+
+def test_freeze_equals_input():
+    out = frozen.freeze(DATA)
+    assert out == DATA
+    assert json.dumps(out, sort_keys=True) == json.dumps(DATA, sort_keys=True)
+    assert isinstance(out['a'], frozen.FrozenList)
+    assert isinstance(out['a'][1]['b'][0], frozen.FrozenList)
+    assert isinstance(out['d'], frozen.FrozenDict)
+
+
+@pytest.mark.parametrize('mutate', [
+    lambda obj: obj.__setitem__('c', 1),
+    lambda obj: obj.pop('c'),
+    lambda obj: obj.update({'x': 1}),
+    lambda obj: obj['a'].append(1),
+    lambda obj: obj['a'].__setitem__(0, 1),
+    lambda obj: obj['a'][1]['b'].clear(),
+])
+def test_read_only(mutate):
+    out = frozen.freeze(DATA)
+    with pytest.raises(TypeError):
+        mutate(out)
+    assert out == DATA
+
+
+def test_copies():
+    out = frozen.freeze(DATA)
+    assert copy.deepcopy(out) is out
+    assert pickle.loads(pickle.dumps(out)) == DATA
+    thawed = frozen.thaw(out)
+    thawed['a'][1]['b'].append(3)
+    assert thawed != DATA
+    assert out == DATA
+
+
+def test_decoder_hook():
+    out = json.loads(json.dumps(DATA), object_pairs_hook=frozen.freezePairs)
+    assert out == DATA
+    assert isinstance(out['a'][1]['b'][0], frozen.FrozenList)
+
+
+def test_thaw_deep():
+    data = leaf = []
+    for _ in range(10000):
+        leaf.append({'k': []})
+        leaf = leaf[0]['k']
+    out = frozen.thaw(frozen.freeze(data))
+    for _ in range(10000):
+        assert type(out) is list and type(out[0]) is dict
+        out = out[0]['k']
+    assert out == []
+
+
+@pytest.mark.parametrize('depth', [3, 5000])
+def test_freeze_loaded(depth):
+    data = DATA
+    for _ in range(depth):
+        data = {'child': [data, 1]}
+    out = frozen.freezeLoaded(data)
+    node = out
+    while 'child' in node:
+        assert isinstance(node['child'], frozen.FrozenList)
+        node = node['child'][0]
+    assert isinstance(node, frozen.FrozenDict)
+    assert isinstance(node['a'][1]['b'][0], frozen.FrozenList)
+    assert node == DATA
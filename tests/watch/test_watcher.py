@@ -0,0 +1,98 @@
+"""Test the watch mode."""
+import pytest
+
+import pyJsJson
+
+
+@pytest.fixture
+def results():
+    return []
+
+
+@pytest.fixture
+def watcher(UnittestFs, UnittestDefaultJsonExpand, results):
+    UnittestFs.mockFile('/unittest/leaf.json', {'value': 1})
+    UnittestFs.mockFile('/unittest/mid.json', {'leaf': {'$ref': 'file:leaf.json'}})
+    UnittestFs.mockFile('/unittest/other.json', {'static': True})
+    UnittestFs.mockFile('/unittest/a.json', {'mid': {'$ref': 'file:mid.json'}, 'other': {'$ref': 'file:other.json'}})
+    UnittestFs.mockFile('/unittest/b.json', {'other': {'$ref': 'file:other.json'}})
+    return pyJsJson.watch.Watcher(
+        UnittestDefaultJsonExpand,
+        ['/unittest/a.json', '/unittest/b.json'],
+        on_result=lambda path, graph, stats: results.append((path, graph.getPlainObject())),
+    )
+
+
+def test_initial_expansion(watcher, results):
+    assert watcher.refresh() == ('/unittest/a.json', '/unittest/b.json')
+    assert dict(results) == {
+        '/unittest/a.json': {'mid': {'leaf': {'value': 1}}, 'other': {'static': True}},
+        '/unittest/b.json': {'other': {'static': True}},
+    }
+    assert watcher.refresh() == ()
+
+
+def test_leaf_change(UnittestFs, UnittestDefaultJsonExpand, watcher, results):
+    watcher.refresh()
+    other_tree = UnittestDefaultJsonExpand.treeCache['expand.tree.uri:/unittest/other.json']
+    del results[:]
+
+    UnittestFs.mockFile('/unittest/leaf.json', {'value': 2})
+    assert watcher.refresh() == ('/unittest/a.json', )
+    assert results == [
+        ('/unittest/a.json', {'mid': {'leaf': {'value': 2}}, 'other': {'static': True}}),
+    ]
+    # Trees that do not depend on the changed file are reused
+    assert UnittestDefaultJsonExpand.treeCache['expand.tree.uri:/unittest/other.json'] is other_tree
+    assert set(watcher.iterDependents('expand.tree.uri:/unittest/leaf.json')) == {
+        'expand.tree.uri:/unittest/leaf.json',
+        'expand.tree.uri:/unittest/mid.json',
+        'expand.tree.uri:/unittest/a.json',
+    }
+
+
+def test_shared_change(UnittestFs, watcher, results):
+    watcher.refresh()
+    UnittestFs.mockFile('/unittest/other.json', {'static': False})
+    assert watcher.refresh() == ('/unittest/a.json', '/unittest/b.json')
+
+
+def test_broken_change(UnittestFs, watcher, results):
+    watcher.refresh()
+    UnittestFs.mockFile('/unittest/mid.json', b'{broken')
+    assert watcher.refresh() == ()  # The error is logged
+    UnittestFs.mockFile('/unittest/mid.json', {'fixed': True})
+    assert watcher.refresh() == ('/unittest/a.json', )
+    assert results[-1] == ('/unittest/a.json', {'mid': {'fixed': True}, 'other': {'static': True}})
+
+
+def test_missing_file_created(UnittestFs, UnittestDefaultJsonExpand, results):
+    UnittestFs.mockFile('/unittest/root.json', {'ref': {'$ref': 'file:missing.json'}})
+    watcher = pyJsJson.watch.Watcher(
+        UnittestDefaultJsonExpand,
+        ['/unittest/root.json'],
+        on_result=lambda path, graph, stats: results.append((path, graph.getPlainObject())),
+    )
+    assert watcher.refresh() == ()  # The error is logged
+    assert watcher.refresh() == ()
+    UnittestFs.mockFile('/unittest/missing.json', {'found': True})
+    assert watcher.refresh() == ('/unittest/root.json', )
+    assert results == [('/unittest/root.json', {'ref': {'found': True}})]
+
+
+def test_broken_new_file(UnittestFs, watcher, results):
+    watcher.refresh()
+    UnittestFs.mockFile('/unittest/new.json', b'{broken')
+    UnittestFs.mockFile('/unittest/b.json', {'new': {'$ref': 'file:new.json'}})
+    assert watcher.refresh() == ()  # The error is logged
+    UnittestFs.mockFile('/unittest/new.json', {'fixed': True})
+    assert watcher.refresh() == ('/unittest/b.json', )
+    assert results[-1] == ('/unittest/b.json', {'new': {'fixed': True}})
+
+
+def test_run_closes_expander(UnittestDefaultJsonExpand, watcher, results, mocker):
+    close = mocker.spy(UnittestDefaultJsonExpand.fileSource, 'close')
+    watcher.run(max_polls=1)
+    assert len(results) == 2
+    assert close.call_count == 1
+    assert UnittestDefaultJsonExpand.fileSource._prefetchPool is None